@@ -3,20 +3,42 @@ Provides authentification and access to Freebox using Freebox OS developer API.
 Freebox API documentation : http://dev.freebox.fr/sdk/os/
 """
 
-# __version__ need to be declare before import to avoid circular import
-# importlib.metadata available from Python 3.8 use importlib_metadata for
-# earlier versions.
-try:
-    from importlib.metadata import version, PackageNotFoundError
-except ImportError:  # pragma: no cover
-    from importlib_metadata import version, PackageNotFoundError  # type: ignore
+# Not imported from typing, which alone costs more than the package import
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any
 
+    from freebox_api.aiofreepybox import Freepybox
 
-try:
-    __version__: str = version(__name__)
-except PackageNotFoundError:  # pragma: no cover
-    __version__ = "unknown"
-
-from freebox_api.aiofreepybox import Freepybox
+    __version__: str
 
 __all__ = ["Freepybox"]
+
+
+# __version__ and Freepybox are resolved on first access: the metadata lookup
+# and aiohttp are only imported when needed, keeping `import freebox_api` and
+# its light submodules (constants, exceptions) fast.
+def __getattr__(name: str) -> "Any":
+    if name == "__version__":
+        version = _get_version()
+        globals()["__version__"] = version
+        return version
+    if name == "Freepybox":
+        from freebox_api.aiofreepybox import Freepybox
+
+        return Freepybox
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _get_version() -> str:
+    # importlib.metadata available from Python 3.8 use importlib_metadata for
+    # earlier versions.
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # pragma: no cover
+        from importlib_metadata import version, PackageNotFoundError  # type: ignore
+
+    try:
+        return version(__name__)
+    except PackageNotFoundError:  # pragma: no cover
+        return "unknown"
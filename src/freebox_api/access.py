@@ -1,19 +1,62 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from functools import partial
 import hmac
 import json
 import logging
+from os import PathLike
+import ssl
+import time
 from typing import Any, Mapping
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
 from typing import Dict
+from typing import IO
+from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
 from urllib.parse import urljoin
 
+from aiohttp import ClientResponse
 from aiohttp import ClientSession
+from aiohttp import ClientTimeout
+from aiohttp import FormData
 
+from freebox_api.batch import BatchResult
+from freebox_api.batch import run_batch
+from freebox_api.cache import resource_root
+from freebox_api.cache import ResponseCache
+from freebox_api.codec import get_codec
+from freebox_api.codec import JsonCodec
 from freebox_api.exceptions import AuthorizationError
 from freebox_api.exceptions import HttpRequestError
 from freebox_api.exceptions import InsufficientPermissionsError
+from freebox_api.metrics import RequestEvent
+from freebox_api.metrics import template_path
+from freebox_api.ratelimit import RateLimiter
+from freebox_api.retry import parse_retry_after
+from freebox_api.retry import RetryPolicy
+from freebox_api.scheduler import PriorityScheduler
+from freebox_api.tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
+# Bound ClientSession method sending the request: get, post, put or delete
+Verb = Callable[..., Awaitable[ClientResponse]]
+
+# Source of an uploaded file: path, content or async iterable of chunks
+UploadSource = Union[str, "PathLike[str]", bytes, AsyncIterable[bytes]]
+# (filename, source) or (filename, source, content type)
+UploadFile = Union[Tuple[str, UploadSource], Tuple[str, UploadSource, str]]
+
+# Request of a batch: "system/" for a GET, or (method, end_url[, payload])
+RequestSpec = Union[str, Tuple[str, str], Tuple[str, str, Any]]
+
 
 class Access:
     def __init__(
@@ -23,22 +66,69 @@ class Access:
         app_token: str,
         app_id: str,
         http_timeout: int,
+        keepalive_interval: Optional[float] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        json_codec: Optional[JsonCodec] = None,
+        response_cache: Optional[ResponseCache] = None,
+        coalesce_requests: bool = False,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        listeners: Optional[List[Callable[[RequestEvent], None]]] = None,
+        tracer: Optional[Tracer] = None,
+        session_token: Optional[str] = None,
+        session_permissions: Optional[Dict[str, bool]] = None,
+        on_session_opened: Optional[
+            Callable[[str, Optional[Dict[str, bool]]], Awaitable[None]]
+        ] = None,
     ):
         self.session = session
         self.base_url = base_url
         self.app_token = app_token
         self.app_id = app_id
         self.timeout = http_timeout
-        self.session_token: Optional[str] = None
-        self.session_permissions: Optional[Dict[str, bool]] = None
+        # SSL context passed with each request when the session is shared
+        # with the host application and its connector doesn't trust the box
+        self.ssl_context = ssl_context
+        self.codec = json_codec or get_codec()
+        self.cache = response_cache
+        # Concurrent identical GETs share one request, and the same result
+        # object which callers must not modify
+        self.coalesce_requests = coalesce_requests
+        self._inflight_gets: Dict[str, "asyncio.Future[Any]"] = {}
+        self.coalesced_requests = 0
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        # Retry counters tell transient failures (recovered) from hard ones
+        self.retry_policy = retry_policy
+        self.retries = 0
+        self.retries_recovered = 0
+        self.retries_exhausted = 0
+        self.listeners: List[Callable[[RequestEvent], None]] = list(listeners or [])
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
+        # A session restored from a previous process is used optimistically,
+        # a rejected request opens a new one through the usual refresh path
+        self.session_token: Optional[str] = session_token
+        self.session_permissions: Optional[Dict[str, bool]] = session_permissions
+        # Called with (session_token, permissions) after each new session
+        self.on_session_opened = on_session_opened
+        # Single in-flight session refresh shared by all the waiting requests
+        self._refresh_future: Optional["asyncio.Future[None]"] = None
+        self.session_refreshes = 0
+        self.session_refreshes_avoided = 0
+        # Optional background task keeping the session alive while idle
+        self.keepalive_interval = keepalive_interval
+        self._keepalive_task: Optional["asyncio.Task[None]"] = None
+        self._last_activity = time.monotonic()
 
     async def _get_challenge(self, base_url, timeout=10):
         """
         Return challenge from Freebox API
         """
         url = urljoin(base_url, "login")
-        resp = await self.session.get(url, timeout=timeout)
-        resp_data = await resp.json()
+        with self.tracer.span("freebox.login.challenge"):
+            resp = await self.session.get(url, timeout=timeout, **self._ssl_params())
+            resp_data = self.codec.loads(await resp.read())
 
         # raise exception if resp.success != True
         if not resp_data.get("success"):
@@ -61,9 +151,12 @@ class Access:
         password = h.hexdigest()
 
         url = urljoin(base_url, "login/session/")
-        data = json.dumps({"app_id": app_id, "password": password})
-        resp = await self.session.post(url, data=data, timeout=timeout)
-        resp_data = await resp.json()
+        data = self.codec.dumps({"app_id": app_id, "password": password})
+        with self.tracer.span("freebox.login.session"):
+            resp = await self.session.post(
+                url, data=data, timeout=timeout, **self._ssl_params()
+            )
+            resp_data = self.codec.loads(await resp.read())
 
         # raise exception if resp.success != True
         if not resp_data.get("success"):
@@ -86,6 +179,98 @@ class Access:
         logger.info("Permissions: " + str(session_permissions))
         self.session_token = session_token
         self.session_permissions = session_permissions
+        if self.on_session_opened is not None:
+            await self.on_session_opened(session_token, session_permissions)
+
+    async def _ensure_session_token(self, stale_token: Optional[str] = None) -> None:
+        """
+        Refresh the session token, sharing one in-flight refresh between callers
+
+        stale_token is the token the caller used when the request was rejected.
+        If the current token differs, another caller already refreshed it.
+        """
+        if self.session_token and self.session_token != stale_token:
+            self.session_refreshes_avoided += 1
+            return
+
+        if self._refresh_future is None:
+            self.session_refreshes += 1
+            self._refresh_future = asyncio.ensure_future(self._refresh_session_token())
+            self._refresh_future.add_done_callback(self._on_refresh_done)
+        else:
+            self.session_refreshes_avoided += 1
+
+        # Shield the shared refresh so a cancelled waiter does not cancel the others
+        await asyncio.shield(self._refresh_future)
+
+    def _on_refresh_done(self, future: "asyncio.Future[None]") -> None:
+        if self._refresh_future is future:
+            self._refresh_future = None
+        if not future.cancelled():
+            # Mark the exception as retrieved, waiters get it through shield()
+            future.exception()
+
+    def start_keepalive(self, interval: Optional[float] = None) -> None:
+        """
+        Start the background task checking the session after interval seconds
+        without request, and opening a new session if the Freebox dropped it.
+        This keeps the login handshake out of the request path.
+        """
+        if interval is not None:
+            self.keepalive_interval = interval
+        if not self.keepalive_interval:
+            raise ValueError("A positive keepalive interval is required")
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.ensure_future(self._keepalive())
+
+    async def stop_keepalive(self) -> None:
+        """
+        Stop the keep-alive background task
+        """
+        if self._keepalive_task is None:
+            return
+        self._keepalive_task.cancel()
+        try:
+            await self._keepalive_task
+        except asyncio.CancelledError:
+            pass
+        self._keepalive_task = None
+
+    async def _keepalive(self) -> None:
+        while self.keepalive_interval:
+            idle = time.monotonic() - self._last_activity
+            if idle < self.keepalive_interval:
+                await asyncio.sleep(self.keepalive_interval - idle)
+                continue
+            try:
+                await self._check_session()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning("Session keep-alive failed: %s", err)
+            self._last_activity = time.monotonic()
+
+    async def _check_session(self) -> None:
+        """
+        Ping the login status and open a new session if the current one is gone
+        """
+        session_token = self.session_token
+        if session_token:
+            url = urljoin(self.base_url, "login")
+            resp = await self.session.get(
+                url,
+                headers={"X-Fbx-App-Auth": session_token},
+                timeout=ClientTimeout(total=self.timeout),
+                **self._ssl_params(),
+            )
+            resp_data = self.codec.loads(await resp.read())
+            if resp_data.get("result", {}).get("logged_in"):
+                return
+            logger.debug("Session expired, opening a new one")
+        await self._ensure_session_token(session_token)
+
+    def _ssl_params(self) -> Dict[str, Any]:
+        return {"ssl": self.ssl_context} if self.ssl_context else {}
 
     def _get_headers(self) -> Dict[str, Optional[str]]:
         return {"X-Fbx-App-Auth": self.session_token}
@@ -94,44 +279,281 @@ class Access:
         """
         Perform the given request, refreshing the session token if needed
         """
+        event = self._new_event(verb, end_url, kwargs.get("data"))
+        start = time.perf_counter()
+        with self.tracer.span(
+            f"freebox.request {event['method']} {event['path']}",
+            {"http.method": event["method"], "freebox.path": event["path"]},
+        ) as span:
+            try:
+                return await self._perform_request_event(verb, end_url, event, **kwargs)
+            except BaseException as err:
+                event["error"] = type(err).__name__
+                raise
+            finally:
+                event["duration"] = time.perf_counter() - start
+                if span is not None:
+                    span.set_attribute("http.status_code", event["status"])
+                    span.set_attribute("freebox.retries", event["retries"])
+                    span.set_attribute("freebox.refreshes", event["refreshes"])
+                    span.set_attribute("freebox.queue_time", event["queue_time"])
+                self._emit(event)
+
+    async def _perform_request_event(
+        self,
+        verb: Verb,
+        end_url: str,
+        event: RequestEvent,
+        file_response: bool = False,
+        **kwargs: Any,
+    ) -> Any:
         if not self.session_token:
-            await self._refresh_session_token()
+            event["refreshes"] += 1
+            await self._ensure_session_token()
 
         url = urljoin(self.base_url, end_url)
+        session_token = self.session_token
+        # Caller headers (e.g. Range) are sent along the session one
+        extra_headers = kwargs.pop("headers", None) or {}
         request_params = {
-            **kwargs,
-            "headers": self._get_headers(),
             "timeout": self.timeout,
+            **kwargs,
+            **self._ssl_params(),
+            "headers": {**extra_headers, **self._get_headers()},
         }
-        resp = await verb(url, **request_params)
+        resp, resp_data = await self._send(verb, url, end_url, request_params, event)
+
+        if resp_data is not None and resp_data.get("error_code") in [
+            "auth_required",
+            "invalid_session",
+        ]:
+            logger.debug("Invalid session")
+            event["refreshes"] += 1
+            await self._ensure_session_token(session_token)
+            request_params["headers"] = {**extra_headers, **self._get_headers()}
+            resp, resp_data = await self._send(
+                verb, url, end_url, request_params, event
+            )
 
         # Return response if content is not json
-        if resp.content_type != "application/json":
+        if resp_data is None:
+            # An error page, unless the caller checks the status of a file
+            if resp.status >= 400 and not file_response:
+                resp.release()
+                raise HttpRequestError(f"Request failed (HTTP {resp.status})")
             return resp
 
-        resp_data = await resp.json()
-        if resp_data.get("error_code") in ["auth_required", "invalid_session"]:
-            logger.debug("Invalid session")
-            await self._refresh_session_token()
-            request_params["headers"] = self._get_headers()
-            resp = await verb(url, **request_params)
-            resp_data = await resp.json()
-
         if not resp_data["success"]:
             err_msg = f"Request failed (APIResponse: {json.dumps(resp_data)})"
             if resp_data.get("error_code") == "insufficient_rights":
                 raise InsufficientPermissionsError(err_msg)
             raise HttpRequestError(err_msg)
 
+        self._last_activity = time.monotonic()
         return resp_data.get("result")
 
+    async def _send(
+        self,
+        verb: Verb,
+        url: str,
+        end_url: str,
+        request_params: Dict[str, Any],
+        event: RequestEvent,
+    ) -> Tuple[ClientResponse, Any]:
+        """
+        Send one HTTP request within the rate limits, retrying transient
+        failures according to the retry policy.
+        Returns (response, decoded body), the body is None if not json
+        """
+        policy = self.retry_policy
+        if policy is None or not policy.allows(verb.__name__):
+            return await self._limited_round_trip(
+                verb, url, end_url, request_params, event
+            )
+        return await self._send_with_retry(
+            policy, verb, url, end_url, request_params, event
+        )
+
+    async def _send_with_retry(
+        self,
+        policy: RetryPolicy,
+        verb: Verb,
+        url: str,
+        end_url: str,
+        request_params: Dict[str, Any],
+        event: RequestEvent,
+    ) -> Tuple[ClientResponse, Any]:
+        start = time.monotonic()
+        retry = 0
+        while True:
+            error: Optional[BaseException] = None
+            try:
+                resp, resp_data = await self._limited_round_trip(
+                    verb, url, end_url, request_params, event
+                )
+            except Exception as err:
+                if not policy.is_retryable_error(err):
+                    raise
+                error = err
+                retry_after = None
+            else:
+                if not policy.is_retryable_status(resp.status):
+                    if retry:
+                        self.retries_recovered += 1
+                    return (resp, resp_data)
+                retry_after = parse_retry_after(resp.headers)
+
+            retry += 1
+            delay = policy.delay(retry, retry_after)
+            if not policy.can_retry(retry, time.monotonic() - start, delay):
+                self.retries_exhausted += 1
+                if error is not None:
+                    raise error
+                return (resp, resp_data)
+
+            if error is None:
+                resp.release()
+            self.retries += 1
+            event["retries"] += 1
+            logger.debug(
+                "Retrying %s %s in %.2fs (%s)",
+                verb.__name__.upper(),
+                end_url,
+                delay,
+                error or f"HTTP {resp.status}",
+            )
+            await asyncio.sleep(delay)
+
+    async def _limited_round_trip(
+        self,
+        verb: Verb,
+        url: str,
+        end_url: str,
+        request_params: Dict[str, Any],
+        event: RequestEvent,
+    ) -> Tuple[ClientResponse, Any]:
+        async with AsyncExitStack() as stack:
+            # Wait for the rate limits first, a request throttled by its family
+            # must not hold a scheduler slot while nothing is sent
+            if self.rate_limiter is not None:
+                event["queue_time"] += await stack.enter_async_context(
+                    self.rate_limiter.acquire(end_url)
+                )
+            if self.scheduler is not None:
+                event["queue_time"] += await stack.enter_async_context(
+                    self.scheduler.acquire(end_url, verb.__name__)
+                )
+            return await self._round_trip(verb, url, request_params, event)
+
+    async def _round_trip(
+        self, verb: Verb, url: str, request_params: Dict[str, Any], event: RequestEvent
+    ) -> Tuple[ClientResponse, Any]:
+        data = request_params.get("data")
+        if callable(data):
+            # Body factory: a streamed body is built anew for each attempt
+            request_params = {**request_params, "data": data()}
+        with self.tracer.span("freebox.http", {"http.url": url}):
+            resp = await verb(url, **request_params)
+            event["status"] = resp.status
+            if resp.content_type != "application/json":
+                event["bytes_in"] += resp.content_length or 0
+                return (resp, None)
+            body = await resp.read()
+        event["bytes_in"] += len(body)
+        with self.tracer.span("freebox.json.decode", {"freebox.bytes": len(body)}):
+            return (resp, self.codec.loads(body))
+
+    def _new_event(self, verb: Verb, end_url: str, data: Any) -> RequestEvent:
+        if isinstance(data, str):
+            bytes_out = len(data.encode())
+        elif isinstance(data, (bytes, bytearray)):
+            bytes_out = len(data)
+        else:
+            bytes_out = 0
+        return {
+            "method": verb.__name__.upper(),
+            "path": template_path(end_url),
+            "status": 0,
+            "bytes_in": 0,
+            "bytes_out": bytes_out,
+            "duration": 0.0,
+            "queue_time": 0.0,
+            "retries": 0,
+            "refreshes": 0,
+            "error": None,
+        }
+
+    def add_listener(self, listener: Callable[[RequestEvent], None]) -> None:
+        """
+        Register a callback receiving a RequestEvent after each request
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[RequestEvent], None]) -> None:
+        """
+        Unregister a request listener
+        """
+        self.listeners.remove(listener)
+
+    def _emit(self, event: RequestEvent) -> None:
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Request listener failed")
+
     async def get(
         self, end_url: str
     ) -> Any:  # Union[Dict[str, Any], List[Dict[str, Any]]]:
         """
         Send get request and return results
         """
-        return await self._perform_request(self.session.get, end_url)
+        if self.cache is None:
+            return await self._get(end_url)
+
+        found, cached = self.cache.get(end_url)
+        if found:
+            # Results are cached encoded so callers can't alter the cached copy
+            return self.codec.loads(cached)
+        generation = self.cache.generation
+        result = await self._get(end_url)
+        if not isinstance(result, ClientResponse):
+            self.cache.set(end_url, self.codec.dumps(result), generation)
+        return result
+
+    async def _get(self, end_url: str) -> Any:
+        """
+        Send get request, joining an identical request in flight if coalescing
+        """
+        if not self.coalesce_requests:
+            return await self._perform_request(self.session.get, end_url)
+
+        inflight = self._inflight_gets.get(end_url)
+        if inflight is not None:
+            self.coalesced_requests += 1
+            result = await asyncio.shield(inflight)
+            if not isinstance(result, ClientResponse):
+                return result
+            # A raw response body can only be read once, get our own
+            return await self._perform_request(self.session.get, end_url)
+
+        inflight = asyncio.ensure_future(
+            self._perform_request(self.session.get, end_url)
+        )
+        self._inflight_gets[end_url] = inflight
+        inflight.add_done_callback(
+            lambda future: self._on_inflight_get_done(end_url, future)
+        )
+        return await asyncio.shield(inflight)
+
+    def _on_inflight_get_done(
+        self, end_url: str, future: "asyncio.Future[Any]"
+    ) -> None:
+        if self._inflight_gets.get(end_url) is future:
+            del self._inflight_gets[end_url]
+        if not future.cancelled():
+            # Mark the exception as retrieved, waiters get it through shield()
+            future.exception()
 
     async def post(
         self, end_url: str, payload: Optional[Mapping[str, Any]] = None
@@ -139,8 +561,11 @@ class Access:
         """
         Send post request and return results
         """
-        data = json.dumps(payload) if payload else None
-        return await self._perform_request(self.session.post, end_url, data=data)  # type: ignore
+        data = self.codec.dumps(payload) if payload else None
+        try:
+            return await self._perform_request(self.session.post, end_url, data=data)  # type: ignore
+        finally:
+            self._invalidate(end_url)
 
     async def put(
         self, end_url: str, payload: Optional[Dict[str, Any]] = None
@@ -148,8 +573,11 @@ class Access:
         """
         Send post request and return results
         """
-        data = json.dumps(payload) if payload else None
-        return await self._perform_request(self.session.put, end_url, data=data)  # type: ignore
+        data = self.codec.dumps(payload) if payload else None
+        try:
+            return await self._perform_request(self.session.put, end_url, data=data)  # type: ignore
+        finally:
+            self._invalidate(end_url)
 
     async def delete(
         self, end_url: str, payload: Optional[Dict[str, Any]] = None
@@ -157,13 +585,147 @@ class Access:
         """
         Send delete request and return results
         """
-        data = json.dumps(payload) if payload else None
-        return await self._perform_request(self.session.delete, end_url, data=data)  # type: ignore
+        data = self.codec.dumps(payload) if payload else None
+        try:
+            return await self._perform_request(self.session.delete, end_url, data=data)  # type: ignore
+        finally:
+            self._invalidate(end_url)
+
+    @asynccontextmanager
+    async def stream(
+        self, end_url: str, headers: Optional[Mapping[str, str]] = None
+    ) -> AsyncIterator[ClientResponse]:
+        """
+        Send a get request for a file and yields the response, its body not read
+        yet. The response cache and request coalescing are bypassed.
+
+        The timeout applies to connecting and to each read rather than to the
+        whole transfer.
+
+        headers : `dict`, optional
+            Additional request headers, e.g. {"Range": "bytes=1024-"}
+        """
+        timeout = ClientTimeout(
+            total=None, sock_connect=self.timeout, sock_read=self.timeout
+        )
+        resp = await self._perform_request(
+            self.session.get,
+            end_url,
+            headers=headers,
+            timeout=timeout,
+            file_response=True,
+        )
+        if resp is None or isinstance(resp, (dict, list)):
+            raise HttpRequestError(f"Expected a file from {end_url}, got {resp!r}")
+        try:
+            yield resp
+        finally:
+            resp.release()
+
+    async def gather(
+        self,
+        requests: Union[Mapping[Any, RequestSpec], Sequence[RequestSpec]],
+        max_concurrency: Optional[int] = None,
+    ) -> BatchResult[Any]:
+        """
+        Send independent requests concurrently, within the client limits.
+        Returns their results by key (by index for a list), the exception
+        raised as result of a failed request, e.g.:
+
+            batch = await access.gather(
+                {"system": "system/", "hosts": "lan/browser/pub/"}
+            )
+
+        requests : `dict` or `list`
+            "end_url" for a GET, or (method, end_url[, payload]) tuples
+        max_concurrency : `int`, optional
+            Default to None, only the scheduler and rate limiter apply
+        """
+        specs = requests if isinstance(requests, Mapping) else dict(enumerate(requests))
+        return await run_batch(
+            {key: partial(self._request, spec) for key, spec in specs.items()},
+            max_concurrency,
+        )
+
+    async def _request(self, spec: RequestSpec) -> Any:
+        if isinstance(spec, str):
+            return await self.get(spec)
+        method, end_url, *payload = spec
+        if method.upper() not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method {method!r}")
+        return await getattr(self, method.lower())(end_url, *payload)
+
+    async def upload(
+        self,
+        end_url: str,
+        fields: Optional[Mapping[str, str]] = None,
+        files: Optional[Mapping[str, UploadFile]] = None,
+    ) -> Any:
+        """
+        Send a multipart/form-data post request and return results.
+        The files are streamed, never loaded whole in memory.
+
+        fields : `dict`, optional
+            Form fields
+        files : `dict`, optional
+            (filename, source[, content type]) by form field. The source is a
+            path, bytes or an async iterable of bytes. A request rejected by
+            an expired session is sent again, except with async iterables
+            which can't be read twice.
+        """
+        opened: List[IO[bytes]] = []
+        attempts = 0
+
+        def form() -> FormData:
+            nonlocal attempts
+            attempts += 1
+            for file in opened:
+                file.close()
+            opened.clear()
+            data = FormData()
+            for field, text in (fields or {}).items():
+                data.add_field(field, text)
+            for name, (filename, source, *content_type) in (files or {}).items():
+                value: Any = source
+                if isinstance(source, (str, PathLike)):
+                    file = open(source, "rb")
+                    opened.append(file)
+                    value = file
+                elif not isinstance(source, (bytes, bytearray)) and attempts > 1:
+                    raise HttpRequestError(f"Can't send the {filename} stream again")
+                data.add_field(
+                    name,
+                    value,
+                    filename=filename,
+                    content_type=content_type[0] if content_type else None,
+                )
+            return data
+
+        try:
+            return await self._perform_request(self.session.post, end_url, data=form)
+        finally:
+            for file in opened:
+                file.close()
+            self._invalidate(end_url)
+
+    def _invalidate(self, end_url: str) -> None:
+        """
+        Forget the GET results of the API written to: cached ones, and the
+        ones in flight so that later GETs don't join a request sent before
+        the write
+        """
+        if self.cache is not None:
+            self.cache.invalidate(end_url)
+        root = resource_root(end_url)
+        for path in [
+            path for path in self._inflight_gets if resource_root(path) == root
+        ]:
+            del self._inflight_gets[path]
 
     async def get_permissions(self) -> Optional[Dict[str, bool]]:
         """
         Returns the permissions for this session/app.
         """
         if not self.session_permissions:
-            await self._refresh_session_token()
+            await self._ensure_session_token(self.session_token)
         return self.session_permissions
@@ -1,4 +1,8 @@
 import asyncio
+from functools import lru_cache
+from functools import partial
+from functools import reduce
+from importlib import import_module
 import json
 import logging
 from os import path
@@ -6,9 +10,16 @@ from os import PathLike
 import socket
 import ssl
 from typing import Any
+from typing import Awaitable
+from typing import Callable
 from typing import Dict
+from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Sequence
 from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import TypedDict
 from typing import Union
 from urllib.parse import urljoin
 
@@ -17,35 +28,51 @@ from aiohttp import TCPConnector
 
 import freebox_api
 from freebox_api.access import Access
-from freebox_api.api.airmedia import Airmedia
-from freebox_api.api.call import Call
-from freebox_api.api.connection import Connection
-from freebox_api.api.dhcp import Dhcp
-from freebox_api.api.download import Download
-from freebox_api.api.freeplug import Freeplug
-from freebox_api.api.fs import Fs
-from freebox_api.api.ftp import Ftp
-from freebox_api.api.fw import Fw
-from freebox_api.api.home import Home
-from freebox_api.api.lan import Lan
-from freebox_api.api.lcd import Lcd
-from freebox_api.api.netshare import Netshare
-from freebox_api.api.notifications import Notifications
-from freebox_api.api.parental import Parental
-from freebox_api.api.phone import Phone
-from freebox_api.api.player import Player
-from freebox_api.api.remote import Remote
-from freebox_api.api.rrd import Rrd
-from freebox_api.api.storage import Storage
-from freebox_api.api.switch import Switch
-from freebox_api.api.system import System
-from freebox_api.api.tv import Tv
-from freebox_api.api.upnpav import Upnpav
-from freebox_api.api.upnpigd import Upnpigd
-from freebox_api.api.wifi import Wifi
+from freebox_api.batch import BatchResult
+from freebox_api.batch import run_batch
+from freebox_api.cache import ResponseCache
+from freebox_api.codec import JsonCodec
 from freebox_api.exceptions import AuthorizationError
 from freebox_api.exceptions import InvalidTokenError
 from freebox_api.exceptions import NotOpenError
+from freebox_api.metrics import RequestEvent
+from freebox_api.ratelimit import RateLimiter
+from freebox_api.retry import RetryPolicy
+from freebox_api.scheduler import PriorityScheduler
+from freebox_api.token_store import APP_TOKEN_KEY
+from freebox_api.token_store import FileTokenStore
+from freebox_api.token_store import SESSION_KEY
+from freebox_api.token_store import TokenStore
+from freebox_api.tracing import trace_module
+from freebox_api.tracing import Tracer
+
+if TYPE_CHECKING:
+    from freebox_api.api.airmedia import Airmedia
+    from freebox_api.api.call import Call
+    from freebox_api.api.connection import Connection
+    from freebox_api.api.dhcp import Dhcp
+    from freebox_api.api.download import Download
+    from freebox_api.api.freeplug import Freeplug
+    from freebox_api.api.fs import Fs
+    from freebox_api.api.ftp import Ftp
+    from freebox_api.api.fw import Fw
+    from freebox_api.api.home import Home
+    from freebox_api.api.lan import Lan
+    from freebox_api.api.lcd import Lcd
+    from freebox_api.api.netshare import Netshare
+    from freebox_api.api.notifications import Notifications
+    from freebox_api.api.parental import Parental
+    from freebox_api.api.phone import Phone
+    from freebox_api.api.player import Player
+    from freebox_api.api.remote import Remote
+    from freebox_api.api.rrd import Rrd
+    from freebox_api.api.storage import Storage
+    from freebox_api.api.switch import Switch
+    from freebox_api.api.system import System
+    from freebox_api.api.tv import Tv
+    from freebox_api.api.upnpav import Upnpav
+    from freebox_api.api.upnpigd import Upnpigd
+    from freebox_api.api.wifi import Wifi
 
 # Token file default location
 DEFAULT_TOKEN_FILENAME: str = "app_auth"  # noqa S105
@@ -62,10 +89,103 @@ DEFAULT_APP_DESC: Dict[str, str] = {
 
 DEFAULT_TIMEOUT = 10
 
+# Freebox certificate authorities bundle
+DEFAULT_CERTIFICATES_FILE: str = path.join(
+    path.dirname(path.abspath(__file__)), "freebox_certificates.pem"
+)
+
+
+class ConnectorOptions(TypedDict, total=False):
+    """
+    Connection pool options passed to aiohttp.TCPConnector.
+
+    limit : `int` – Maximum number of simultaneous connections (0 for no limit)
+    limit_per_host : `int` – Maximum number of connections to the same endpoint
+    keepalive_timeout : `float` – Seconds an idle connection is kept for reuse
+    force_close : `bool` – Close connections after each request
+    use_dns_cache : `bool` – Cache DNS resolutions
+    ttl_dns_cache : `int` – Seconds a DNS resolution is cached (None for ever)
+    happy_eyeballs_delay : `float` – RFC 8305 connection attempt delay
+    (requires aiohttp >= 3.10)
+    """
+
+    limit: int
+    limit_per_host: int
+    keepalive_timeout: float
+    force_close: bool
+    use_dns_cache: bool
+    ttl_dns_cache: Optional[int]
+    happy_eyeballs_delay: Optional[float]
+
+
+@lru_cache(maxsize=None)
+def get_ssl_context(cafile: str, freebox_certificate: bool) -> ssl.SSLContext:
+    """
+    Returns the SSL context trusting the given CA bundle, shared by the process.
+
+    Loading the bundle is done once per (cafile, host class) instead of on every
+    open(). The returned context is shared and must not be modified.
+
+    cafile : `str`
+        Path of the CA bundle to trust
+    freebox_certificate : `bool`
+        True for hosts presenting the default Freebox certificate
+    """
+    ssl_ctx = ssl.create_default_context()
+    ssl_ctx.load_verify_locations(cafile=cafile)
+    if freebox_certificate:
+        # Disable strict validating introduced in Python 3.13, which doesn't
+        # work with default Freebox certificates
+        ssl_ctx.verify_flags &= ~ssl.VERIFY_X509_STRICT
+    return ssl_ctx
+
+
+def _has_freebox_certificate(host: str) -> bool:
+    """
+    Returns True if the host uses the default, Freebox CA signed, certificate
+    """
+    return ".fbxos.fr" in host or "mafreebox.freebox.fr" in host
+
+
 StrOrPath = Union[str, "PathLike[str]"]  # type TypeAlias but issues with <= py3.9
 
+
 logger = logging.getLogger(__name__)
 
+# Call of a batch: dotted API method name, e.g. "connection.get_status", a
+# (name, *args) tuple, or a coroutine function called with the Freepybox
+BatchCall = Union[str, Tuple[Any, ...], Callable[["Freepybox"], Awaitable[Any]]]
+
+# Freepybox attribute name: (module, class) of the API modules, built on first use
+_MODULES: Dict[str, Tuple[str, str]] = {
+    "tv": ("freebox_api.api.tv", "Tv"),
+    "system": ("freebox_api.api.system", "System"),
+    "dhcp": ("freebox_api.api.dhcp", "Dhcp"),
+    "airmedia": ("freebox_api.api.airmedia", "Airmedia"),
+    "player": ("freebox_api.api.player", "Player"),
+    "switch": ("freebox_api.api.switch", "Switch"),
+    "lan": ("freebox_api.api.lan", "Lan"),
+    "storage": ("freebox_api.api.storage", "Storage"),
+    "lcd": ("freebox_api.api.lcd", "Lcd"),
+    "wifi": ("freebox_api.api.wifi", "Wifi"),
+    "phone": ("freebox_api.api.phone", "Phone"),
+    "ftp": ("freebox_api.api.ftp", "Ftp"),
+    "fs": ("freebox_api.api.fs", "Fs"),
+    "fw": ("freebox_api.api.fw", "Fw"),
+    "freeplug": ("freebox_api.api.freeplug", "Freeplug"),
+    "call": ("freebox_api.api.call", "Call"),
+    "connection": ("freebox_api.api.connection", "Connection"),
+    "download": ("freebox_api.api.download", "Download"),
+    "home": ("freebox_api.api.home", "Home"),
+    "parental": ("freebox_api.api.parental", "Parental"),
+    "netshare": ("freebox_api.api.netshare", "Netshare"),
+    "notifications": ("freebox_api.api.notifications", "Notifications"),
+    "remote": ("freebox_api.api.remote", "Remote"),
+    "rrd": ("freebox_api.api.rrd", "Rrd"),
+    "upnpav": ("freebox_api.api.upnpav", "Upnpav"),
+    "upnpigd": ("freebox_api.api.upnpigd", "Upnpigd"),
+}
+
 
 class Freepybox:
 
@@ -75,15 +195,49 @@ class Freepybox:
         token_file: StrOrPath = DEFAULT_TOKEN_FILE,
         api_version: str = "v3",
         timeout: int = DEFAULT_TIMEOUT,
+        keepalive_interval: Optional[float] = None,
+        connector_options: Optional[ConnectorOptions] = None,
+        json_codec: Optional[JsonCodec] = None,
+        response_cache: Optional[ResponseCache] = None,
+        coalesce_requests: bool = False,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        request_listeners: Optional[List[Callable[[RequestEvent], None]]] = None,
+        tracing: bool = False,
+        persist_session: bool = False,
+        token_store: Optional[TokenStore] = None,
     ):
         self.app_desc: Dict[str, str] = app_desc
         self.token_file: StrOrPath = token_file
+        # Application token and persisted session storage, token_file by default
+        self.token_store: TokenStore = (
+            token_store if token_store is not None else FileTokenStore(token_file)
+        )
         self.api_version: str = api_version
         self.timeout: int = timeout
+        self.keepalive_interval: Optional[float] = keepalive_interval
+        self.connector_options: ConnectorOptions = connector_options or {}
+        self.json_codec: Optional[JsonCodec] = json_codec
+        self.response_cache: Optional[ResponseCache] = response_cache
+        self.coalesce_requests: bool = coalesce_requests
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: Optional[RetryPolicy] = retry_policy
+        self.scheduler: Optional[PriorityScheduler] = scheduler
+        self.request_listeners: List[Callable[[RequestEvent], None]] = list(
+            request_listeners or []
+        )
+        # OpenTelemetry spans, a no-op if opentelemetry-api isn't installed
+        self.tracer: Tracer = Tracer(enabled=tracing)
+        # Keep the session token in the token store so a new process
+        # skips the login handshake, the session is then not closed on close()
+        self.persist_session: bool = persist_session
         self._session: ClientSession
+        self._owns_session: bool = True
+        self._request_ssl: Optional[ssl.SSLContext] = None
         self._access: Access
 
-        # Define modules
+        # Define modules, instantiated on first access after open()
         self.tv: Tv
         self.system: System
         self.dhcp: Dhcp
@@ -111,56 +265,70 @@ class Freepybox:
         self.upnpav: Upnpav
         self.upnpigd: Upnpigd
 
-    async def open(self, host: str, port: str) -> None:
+    def __getattr__(self, name: str) -> Any:
+        """
+        Import and instantiate the API module on first access
+        """
+        if name not in _MODULES or "_access" not in self.__dict__:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            )
+        module_name, class_name = _MODULES[name]
+        module = getattr(import_module(module_name), class_name)(self._access)
+        if self.tracer.enabled:
+            trace_module(module, name, self.tracer)
+        setattr(self, name, module)
+        return module
+
+    async def open(
+        self, host: str, port: str, session: Optional[ClientSession] = None
+    ) -> None:
         """
         Open a session to the freebox, get a valid access module
         and instantiate freebox modules
+
+        session : `ClientSession`, optional
+            Shared session of the host application. Its connector settings are
+            used and it is left open by close().
+            Default to None, a dedicated session is created using
+            connector_options.
         """
         if not self._is_app_desc_valid(self.app_desc):
             raise InvalidTokenError("Invalid application descriptor")
 
-        cert_path = path.join(path.dirname(__file__), "freebox_certificates.pem")
-        ssl_ctx = ssl.create_default_context()
-        ssl_ctx.load_verify_locations(cafile=cert_path)
-        if ".fbxos.fr" in host or "mafreebox.freebox.fr" in host:
-            # Disable strict validating introduced in Python 3.13, which doesn't
-            # work with default Freebox certificates
-            ssl_ctx.verify_flags &= ~ssl.VERIFY_X509_STRICT
+        ssl_ctx = get_ssl_context(
+            DEFAULT_CERTIFICATES_FILE, _has_freebox_certificate(host)
+        )
 
-        conn = TCPConnector(ssl_context=ssl_ctx)
-        self._session = ClientSession(connector=conn)
+        # Re-opening: stop the keep-alive of the replaced access and close the
+        # session it owned
+        previous: Optional[Access] = self.__dict__.get("_access")
+        if previous is not None:
+            await previous.stop_keepalive()
+        previous_session: Optional[ClientSession] = self.__dict__.get("_session")
+        if previous_session is not None and self._owns_session:
+            await previous_session.close()
+
+        if session is None:
+            conn = TCPConnector(ssl_context=ssl_ctx, **self.connector_options)
+            self._session = ClientSession(connector=conn)
+            self._owns_session = True
+            self._request_ssl = None
+        else:
+            # The shared connector doesn't know the Freebox CA, give it per request
+            self._session = session
+            self._owns_session = False
+            self._request_ssl = ssl_ctx
 
         self._access = await self._get_freebox_access(
             host, port, self.api_version, self.token_file, self.app_desc, self.timeout
         )
+        if self.keepalive_interval:
+            self._access.start_keepalive()
 
-        # Instantiate freebox modules
-        self.tv = Tv(self._access)
-        self.system = System(self._access)
-        self.dhcp = Dhcp(self._access)
-        self.airmedia = Airmedia(self._access)
-        self.player = Player(self._access)
-        self.switch = Switch(self._access)
-        self.lan = Lan(self._access)
-        self.storage = Storage(self._access)
-        self.lcd = Lcd(self._access)
-        self.wifi = Wifi(self._access)
-        self.phone = Phone(self._access)
-        self.ftp = Ftp(self._access)
-        self.fs = Fs(self._access)
-        self.fw = Fw(self._access)
-        self.freeplug = Freeplug(self._access)
-        self.call = Call(self._access)
-        self.connection = Connection(self._access)
-        self.download = Download(self._access)
-        self.home = Home(self._access)
-        self.parental = Parental(self._access)
-        self.netshare = Netshare(self._access)
-        self.notifications = Notifications(self._access)
-        self.remote = Remote(self._access)
-        self.rrd = Rrd(self._access)
-        self.upnpav = Upnpav(self._access)
-        self.upnpigd = Upnpigd(self._access)
+        # Drop the modules bound to a previous access, they are built on first use
+        for name in _MODULES:
+            self.__dict__.pop(name, None)
 
     async def close(self) -> None:
         """
@@ -169,8 +337,50 @@ class Freepybox:
         if not self._access:
             raise NotOpenError("Freebox is not open")
 
-        await self._access.post("login/logout")
-        await self._session.close()
+        await self._access.stop_keepalive()
+        if not self.persist_session:
+            await self._access.post("login/logout")
+        if self._owns_session:
+            await self._session.close()
+
+    async def batch(
+        self,
+        calls: Union[Mapping[Any, BatchCall], Sequence[BatchCall]],
+        max_concurrency: Optional[int] = None,
+    ) -> BatchResult[Any]:
+        """
+        Run independent API calls concurrently, within the client limits.
+        Returns their results by key (by index for a list), the exception
+        raised as result of a failed call, e.g.:
+
+            batch = await fbx.batch(
+                {
+                    "config": "system.get_config",
+                    "hosts": ("lan.get_hosts_list", "pub"),
+                }
+            )
+            batch["config"], batch.wall_time, batch.latency_total
+
+        calls : `dict` or `list`
+            Dotted API method name, (name, *args) tuple, or coroutine function
+            called with the Freepybox
+        max_concurrency : `int`, optional
+            Default to None, only the scheduler and rate limiter apply
+        """
+        specs = calls if isinstance(calls, Mapping) else dict(enumerate(calls))
+        return await run_batch(
+            {key: partial(self._call, spec) for key, spec in specs.items()},
+            max_concurrency,
+        )
+
+    async def _call(self, spec: BatchCall) -> Any:
+        if callable(spec):
+            return await spec(self)
+        if isinstance(spec, str):
+            spec = (spec,)
+        name, *args = spec
+        method: Any = reduce(getattr, name.split("."), self)
+        return await method(*args)
 
     async def get_permissions(self) -> Optional[Dict[str, bool]]:
         """
@@ -207,7 +417,7 @@ class Freepybox:
 
         # Read stored application token
         logger.info("Read application authorization file")
-        app_token, track_id, file_app_desc = self._readfile_app_token(token_file)
+        app_token, track_id, file_app_desc = await self._read_app_token()
 
         # If no valid token is stored then request a token to freebox api -
         # Only for LAN connection
@@ -245,12 +455,44 @@ class Freepybox:
             logger.info("Application authorization granted")
 
             # Store application token in file
-            self._writefile_app_token(app_token, track_id, app_desc, token_file)
-            logger.info("Application token file was generated: %s", token_file)
+            await self._write_app_token(app_token, track_id, app_desc)
+            logger.info("Application token was stored")
+            # A stored session belongs to the previous application token
+            await self.token_store.delete(SESSION_KEY)
+
+        session_token: Optional[str] = None
+        session_permissions: Optional[Dict[str, bool]] = None
+        on_session_opened: Optional[
+            Callable[[str, Optional[Dict[str, bool]]], Awaitable[None]]
+        ] = None
+        if self.persist_session:
+            session_token, session_permissions = await self._read_session(
+                base_url, app_desc["app_id"]
+            )
+            on_session_opened = partial(
+                self._write_session, base_url=base_url, app_id=app_desc["app_id"]
+            )
 
         # Create freebox http access module
         fbx_access = Access(
-            self._session, base_url, app_token, app_desc["app_id"], timeout
+            self._session,
+            base_url,
+            app_token,
+            app_desc["app_id"],
+            timeout,
+            keepalive_interval=self.keepalive_interval,
+            ssl_context=self._request_ssl,
+            json_codec=self.json_codec,
+            response_cache=self.response_cache,
+            coalesce_requests=self.coalesce_requests,
+            rate_limiter=self.rate_limiter,
+            retry_policy=self.retry_policy,
+            scheduler=self.scheduler,
+            listeners=self.request_listeners,
+            tracer=self.tracer,
+            session_token=session_token,
+            session_permissions=session_permissions,
+            on_session_opened=on_session_opened,
         )
 
         return fbx_access
@@ -269,7 +511,9 @@ class Freepybox:
             denied: the user denied the authorization request
         """
         url = urljoin(base_url, f"login/authorize/{track_id}")
-        resp = await self._session.get(url, timeout=ClientTimeout(total=timeout))
+        resp = await self._session.get(
+            url, timeout=ClientTimeout(total=timeout), **self._ssl_params()
+        )
         resp_data = await resp.json()
         return str(resp_data["result"]["status"])
 
@@ -284,7 +528,7 @@ class Freepybox:
         url = urljoin(base_url, "login/authorize/")
         data = json.dumps(app_desc)
         resp = await self._session.post(
-            url, data=data, timeout=ClientTimeout(total=timeout)
+            url, data=data, timeout=ClientTimeout(total=timeout), **self._ssl_params()
         )
         resp_data = await resp.json()
 
@@ -299,46 +543,77 @@ class Freepybox:
 
         return (app_token, track_id)
 
-    def _writefile_app_token(
-        self,
-        app_token: str,
-        track_id: int,
-        app_desc: Dict[str, str],
-        token_file: StrOrPath,
+    async def _write_app_token(
+        self, app_token: str, track_id: int, app_desc: Dict[str, str]
     ) -> None:
         """
-        Store the application token in g_app_auth_file file
+        Store the application token in the token store
         """
         file_content: Dict[str, Union[str, int]] = {
             **app_desc,
             "app_token": app_token,
             "track_id": track_id,
         }
+        await self.token_store.save(APP_TOKEN_KEY, file_content)
 
-        with open(token_file, "w") as f:
-            json.dump(file_content, f)
-
-    def _readfile_app_token(
-        self, token_file: StrOrPath
+    async def _read_app_token(
+        self,
     ) -> Union[Tuple[str, int, Dict[str, Any]], Tuple[None, None, None]]:
         """
-        Read the application token in the authentication file.
+        Read the application token in the token store.
         Returns (app_token, track_id, app_desc)
         """
+        d = await self.token_store.load(APP_TOKEN_KEY)
+        if d is None or "app_token" not in d or "track_id" not in d:
+            return (None, None, None)
+        app_token: str = d["app_token"]
+        track_id: int = d["track_id"]
+        app_desc: Dict[str, str] = {
+            k: d[k]
+            for k in ("app_id", "app_name", "app_version", "device_name")
+            if k in d
+        }
+        return (app_token, track_id, app_desc)
+
+    async def _write_session(
+        self,
+        session_token: str,
+        permissions: Optional[Dict[str, bool]],
+        base_url: str,
+        app_id: str,
+    ) -> None:
+        """
+        Store the session token in the token store
+        """
+        file_content = {
+            "base_url": base_url,
+            "app_id": app_id,
+            "session_token": session_token,
+            "permissions": permissions,
+        }
         try:
-            with open(token_file, "r") as f:
-                d = json.load(f)
-                app_token: str = d["app_token"]
-                track_id: int = d["track_id"]
-                app_desc: Dict[str, str] = {
-                    k: d[k]
-                    for k in ("app_id", "app_name", "app_version", "device_name")
-                    if k in d
-                }
-                return (app_token, track_id, app_desc)
+            await self.token_store.save(SESSION_KEY, file_content)
+        except OSError as err:
+            logger.warning("Unable to store the session token: %s", err)
 
-        except FileNotFoundError:
-            return (None, None, None)
+    async def _read_session(
+        self, base_url: str, app_id: str
+    ) -> Tuple[Optional[str], Optional[Dict[str, bool]]]:
+        """
+        Read the session token stored for this Freebox and application.
+        Returns (session_token, permissions)
+        """
+        try:
+            d = await self.token_store.load(SESSION_KEY)
+        except OSError as err:
+            logger.warning("Unable to read the session token: %s", err)
+            return (None, None)
+        if d is None or (d.get("base_url"), d.get("app_id")) != (base_url, app_id):
+            return (None, None)
+        return (d.get("session_token"), d.get("permissions"))
+
+    def _ssl_params(self) -> Dict[str, Any]:
+        return {"ssl": self._request_ssl} if self._request_ssl else {}
 
     def _get_base_url(self, host: str, port: str, api_version: str) -> str:
         """
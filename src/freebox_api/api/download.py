@@ -3,7 +3,10 @@ Download API.
 https://dev.freebox.fr/sdk/os/download/
 """
 
+import asyncio
 import base64
+from functools import partial
+import os
 
 import sys
 
@@ -12,10 +15,37 @@ if sys.version_info < (3, 12):
 else:
     from typing import Required
 from typing import Any, TypedDict, Union, List
+from typing import AsyncIterator
+from typing import Callable
 from typing import Dict
+from typing import Iterable
 from typing import Optional
+from typing import Sequence
 
 from freebox_api.access import Access
+from freebox_api.access import UploadSource
+from freebox_api.api.fs import Fs
+from freebox_api.batch import BatchResult
+from freebox_api.batch import run_batch
+from freebox_api.exceptions import ChecksumError
+from freebox_api.exceptions import HttpRequestError
+from freebox_api.transfer import DEFAULT_CHUNK_SIZE
+from freebox_api.transfer import download_segmented
+from freebox_api.transfer import download_to_file
+from freebox_api.transfer import file_digest
+from freebox_api.transfer import iter_stream
+from freebox_api.transfer import ProgressCallback
+from freebox_api.transfer import StrOrPath
+from freebox_api.transfer import TransferProgress
+
+# Download ids, or predicate selecting tasks of get_download_tasks()
+DownloadSelection = Union[Iterable[int], Callable[[Dict[str, Any]], bool]]
+
+# Content type of the uploaded download files, by extension
+_DOWNLOAD_FILE_TYPES = {
+    ".torrent": "application/x-bittorrent",
+    ".nzb": "application/x-nzb",
+}
 
 
 class _DownloadAddURL(TypedDict, total=False):
@@ -123,9 +153,9 @@ class Download:
     }
     mark_item_as_read_schema = {"is_read": True}
 
-    async def get_download_tasks(self) -> Dict[str, Any]:
+    async def get_download_tasks(self) -> Optional[List[Dict[str, Any]]]:
         """
-        Get downloads
+        Get downloads, None if there is none
         """
         return await self._access.get("downloads/")  # type: ignore
 
@@ -164,6 +194,90 @@ class Download:
         """
         return await self._access.put(f"downloads/{download_id}", download_update_data)
 
+    async def update_many(
+        self,
+        downloads: DownloadSelection,
+        download_update_data: Dict[str, Any],
+        max_concurrency: Optional[int] = 8,
+    ) -> BatchResult[int]:
+        """
+        Update many downloads concurrently, e.g. {"status": "stopped"} to pause
+        them. Returns the result of each update, or the exception it raised, by
+        download id.
+
+        downloads : `list` or `callable`
+            Download ids, or predicate over the tasks of get_download_tasks(),
+            e.g. lambda task: task["status"] == "seeding"
+        download_update_data : `dict`
+        max_concurrency : `int`, optional
+            Default to 8, updates in flight
+        """
+        return await run_batch(
+            {
+                download_id: partial(
+                    self.update_download_task, download_id, download_update_data
+                )
+                for download_id in await self._select(downloads)
+            },
+            max_concurrency,
+        )
+
+    async def delete_many(
+        self,
+        downloads: DownloadSelection,
+        erase_files: bool = False,
+        max_concurrency: Optional[int] = 8,
+    ) -> BatchResult[int]:
+        """
+        Delete many downloads concurrently. Returns None for each deleted
+        download, or the exception raised, by download id.
+
+        downloads : `list` or `callable`
+            Download ids, or predicate over the tasks of get_download_tasks()
+        erase_files : `bool`
+            Default to False, also delete the downloaded files
+        max_concurrency : `int`, optional
+            Default to 8, deletions in flight
+        """
+        delete = (
+            self.delete_download_task_files
+            if erase_files
+            else self.delete_download_task
+        )
+        return await run_batch(
+            {
+                download_id: partial(delete, download_id)
+                for download_id in await self._select(downloads)
+            },
+            max_concurrency,
+        )
+
+    async def set_priority_many(
+        self,
+        downloads: DownloadSelection,
+        io_priority: str,
+        max_concurrency: Optional[int] = 8,
+    ) -> BatchResult[int]:
+        """
+        Set the io priority of many downloads concurrently
+
+        downloads : `list` or `callable`
+            Download ids, or predicate over the tasks of get_download_tasks()
+        io_priority : `str`
+            "low", "normal" or "high"
+        max_concurrency : `int`, optional
+            Default to 8, updates in flight
+        """
+        return await self.update_many(
+            downloads, {"io_priority": io_priority}, max_concurrency
+        )
+
+    async def _select(self, downloads: DownloadSelection) -> List[int]:
+        if not callable(downloads):
+            return list(downloads)
+        tasks = await self.get_download_tasks()
+        return [task["id"] for task in tasks or () if downloads(task)]
+
     async def get_download_log(self, download_id: int) -> Dict[str, Any]:
         """
         Get download log
@@ -233,27 +347,71 @@ class Download:
 
     async def add_download_task_from_file(
         self,
-        download_file: str,
+        download_file: UploadSource,
         download_dir: Optional[str] = None,
         archive_password: Optional[str] = None,
+        filename: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
-        Add download from file
+        Add download from a .torrent or .nzb file, uploaded as
+        multipart/form-data without loading it whole in memory
 
-        download_file : `str`
+        download_file : `str`, `PathLike`, `bytes` or async iterable of `bytes`
+            Path or content of the file
         download_dir : `str`, optional
             Default to None
         archive_password : `str`, optional
             Default to None
+        filename : `str`, optional
+            Default to None, the name of the download_file path
         """
-        download_params: DownloadAddFile = {
-            "download_file": download_file,
-        }
+        fields: Dict[str, str] = {}
         if download_dir:
-            download_params["download_dir"] = download_dir
+            fields["download_dir"] = download_dir
         if archive_password:
-            download_params["archive_password"] = archive_password
-        return await self.add_download_task(download_params)
+            fields["archive_password"] = archive_password
+        if filename is None:
+            filename = (
+                os.path.basename(download_file)
+                if isinstance(download_file, (str, os.PathLike))
+                else "download.torrent"
+            )
+        content_type = _DOWNLOAD_FILE_TYPES.get(
+            os.path.splitext(filename)[1].lower(), "application/octet-stream"
+        )
+        return await self._access.upload(  # type: ignore
+            "downloads/add/",
+            fields,
+            {"download_file": (filename, download_file, content_type)},
+        )
+
+    async def add_download_tasks_from_files(
+        self,
+        download_files: Sequence[UploadSource],
+        download_dir: Optional[str] = None,
+        max_concurrency: Optional[int] = 4,
+    ) -> BatchResult[int]:
+        """
+        Add downloads from many .torrent or .nzb files uploaded concurrently,
+        within the client rate limits. Returns the result of each upload, or
+        the exception it raised, by index in download_files.
+
+        download_files : `list`
+            Paths or contents of the files
+        download_dir : `str`, optional
+            Default to None
+        max_concurrency : `int`, optional
+            Default to 4, uploads in flight
+        """
+        return await run_batch(
+            {
+                index: partial(
+                    self.add_download_task_from_file, download_file, download_dir
+                )
+                for index, download_file in enumerate(download_files)
+            },
+            max_concurrency,
+        )
 
     # Download Stats
 
@@ -528,3 +686,121 @@ class Download:
         """
         path_b64 = base64.b64encode(file_path.encode("utf-8")).decode("utf-8")
         return await self._access.get(f"dl/{path_b64}")  # type: ignore
+
+    def iter_file(
+        self, file_path: str, offset: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream a file of the box disk, yields its chunks
+
+        file_path : `str`
+        offset : `int`
+            Default to 0, first byte to get
+        chunk_size : `int`
+            Default to 256 KiB
+        """
+        path_b64 = base64.b64encode(file_path.encode("utf-8")).decode("utf-8")
+        return iter_stream(self._access, f"dl/{path_b64}", offset, chunk_size)
+
+    async def save_file(
+        self,
+        file_path: str,
+        destination: StrOrPath,
+        resume: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> TransferProgress:
+        """
+        Save a file of the box disk to destination, resuming after network
+        failures. Returns the transfer size and throughput.
+
+        file_path : `str`
+        destination : `str` or `PathLike`
+        resume : `bool`
+            Default to False, continue a partial destination file. It is
+            fetched again if it is larger than the file of the box or older
+            than its last modification.
+        progress : `callable`, optional
+            Called with the TransferProgress during the transfer
+        chunk_size : `int`
+            Default to 256 KiB
+        """
+        path_b64 = base64.b64encode(file_path.encode("utf-8")).decode("utf-8")
+        return await download_to_file(
+            self._access,
+            f"dl/{path_b64}",
+            destination,
+            resume=resume,
+            chunk_size=chunk_size,
+            progress=progress,
+        )
+
+    async def save_file_segmented(
+        self,
+        file_path: str,
+        destination: StrOrPath,
+        segments: int = 4,
+        checksum: Optional[str] = "sha1",
+        progress: Optional[ProgressCallback] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> TransferProgress:
+        """
+        Save a large file of the box disk to destination with concurrent
+        Range requests, each segment retried on network failures.
+        Returns the transfer size and throughput.
+
+        file_path : `str`
+        destination : `str` or `PathLike`
+        segments : `int`
+            Default to 4, concurrent requests
+        checksum : `str`, optional
+            Default to sha1, hash computed by the box during the transfer and
+            compared to the one of destination. None to skip the check.
+        progress : `callable`, optional
+            Called with the TransferProgress during the transfer
+        chunk_size : `int`
+            Default to 256 KiB
+        """
+        fs = Fs(self._access)
+        size = _file_size(await fs.get_file_info(file_path), file_path)
+        box_hash = (
+            asyncio.ensure_future(fs.get_file_hash(file_path, checksum))
+            if checksum
+            else None
+        )
+        try:
+            path_b64 = base64.b64encode(file_path.encode("utf-8")).decode("utf-8")
+            result = await download_segmented(
+                self._access,
+                f"dl/{path_b64}",
+                destination,
+                size,
+                segments=segments,
+                chunk_size=chunk_size,
+                progress=progress,
+            )
+        except BaseException:
+            if box_hash is not None:
+                box_hash.cancel()
+                await asyncio.gather(box_hash, return_exceptions=True)
+            raise
+
+        if box_hash is not None and checksum is not None:
+            expected = str(await box_hash).lower()
+            actual = await file_digest(destination, checksum)
+            if actual != expected:
+                raise ChecksumError(
+                    f"{checksum} of {destination} is {actual}, expected {expected}"
+                )
+        return result
+
+
+def _file_size(info: Any, file_path: str) -> int:
+    """
+    Returns the size of a file from its Fs.get_file_info() result
+    """
+    if isinstance(info, list) and len(info) == 1:
+        info = info[0]
+    if not isinstance(info, dict) or info.get("type", "file") != "file":
+        raise HttpRequestError(f"{file_path} is not a file")
+    return int(info["size"])
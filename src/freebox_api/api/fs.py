@@ -3,6 +3,7 @@ File System API.
 https://dev.freebox.fr/sdk/os/fs/
 """
 
+import asyncio
 import base64
 import logging
 import os
@@ -115,6 +116,39 @@ class Fs:
         """
         return await self._access.get(f"fs/tasks/{hash_id}/hash")
 
+    async def get_task(self, task_id):
+        """
+        Returns the task with the given id
+
+        task_id : `int`
+        """
+        return await self._access.get(f"fs/tasks/{task_id}")
+
+    async def get_file_hash(self, path, hash_type="sha1", poll_interval=0.5):
+        """
+        Hash a file on the box and returns its hexadecimal digest, once the
+        hash task is done. The task is deleted afterwards.
+
+        path : `str`
+            The file with its path
+        hash_type : `str`
+            Default to sha1
+        poll_interval : `float`
+            Default to 0.5, seconds between two checks of the task
+        """
+        task = await self.hash_file(path, hash_type)
+        try:
+            while task["state"] not in ("done", "failed"):
+                await asyncio.sleep(poll_interval)
+                task = await self.get_task(task["id"])
+            if task["state"] == "failed":
+                raise freebox_api.exceptions.HttpRequestError(
+                    f"Hashing {path} failed: {task.get('error')}"
+                )
+            return await self.get_hash(task["id"])
+        finally:
+            await self.delete_file_task(task["id"])
+
     async def get_tasks_list(self):
         """
         Returns the collection of all tasks
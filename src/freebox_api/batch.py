@@ -0,0 +1,141 @@
+"""
+Concurrent execution of independent calls with one result map.
+"""
+
+import asyncio
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Generic
+from typing import Hashable
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
+from typing import TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class BatchResult(Generic[K]):
+    """
+    Results of a batch, by call key.
+
+    The value of a failed call is the exception it raised, the batch itself
+    doesn't fail.
+    """
+
+    def __init__(
+        self,
+        results: Dict[K, Any],
+        latencies: Dict[K, float],
+        wall_time: float,
+    ) -> None:
+        self.results = results
+        self.latencies = latencies
+        self.wall_time = wall_time
+
+    def __getitem__(self, key: K) -> Any:
+        return self.results[key]
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @property
+    def errors(self) -> Dict[K, BaseException]:
+        """
+        Returns the exceptions raised by the failed calls
+        """
+        return {
+            key: result
+            for key, result in self.results.items()
+            if isinstance(result, BaseException)
+        }
+
+    @property
+    def ok(self) -> bool:
+        """
+        Returns True if every call succeeded
+        """
+        return not self.errors
+
+    def raise_for_errors(self) -> None:
+        """
+        Raise the exception of the first failed call, if any
+        """
+        for error in self.errors.values():
+            raise error
+
+    @property
+    def latency_total(self) -> float:
+        """
+        Returns the sum of the call latencies in seconds, the time the calls
+        would have taken one after the other
+        """
+        return sum(self.latencies.values())
+
+    @property
+    def speedup(self) -> float:
+        """
+        Returns the sum of the latencies over the wall time of the batch
+        """
+        return self.latency_total / self.wall_time if self.wall_time else 1.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Returns the calls completed per second of wall time
+        """
+        return len(self) / self.wall_time if self.wall_time else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"BatchResult(calls={len(self)}, errors={len(self.errors)}, "
+            f"wall_time={self.wall_time:.3f}, latency_total={self.latency_total:.3f}, "
+            f"throughput={self.throughput:.1f}/s)"
+        )
+
+
+async def run_batch(
+    calls: Mapping[K, Callable[[], Awaitable[Any]]],
+    max_concurrency: Optional[int] = None,
+) -> BatchResult[K]:
+    """
+    Run the calls concurrently and returns their results by key
+
+    calls : `dict`
+        Coroutine functions without arguments, by key
+    max_concurrency : `int`, optional
+        Default to None, no other limit than the client ones
+        (scheduler, rate limiter, connection pool)
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    results: Dict[K, Any] = {}
+    latencies: Dict[K, float] = {}
+
+    async def run(key: K, call: Callable[[], Awaitable[Any]]) -> None:
+        if semaphore is not None:
+            await semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            results[key] = await call()
+        except Exception as err:
+            results[key] = err
+        finally:
+            latencies[key] = time.perf_counter() - start
+            if semaphore is not None:
+                semaphore.release()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(key, call) for key, call in calls.items()))
+    wall_time = time.perf_counter() - start
+    # Keep the order of the calls rather than the completion one
+    return BatchResult(
+        {key: results[key] for key in calls},
+        {key: latencies[key] for key in calls},
+        wall_time,
+    )
@@ -0,0 +1,142 @@
+"""
+Cache of read-only GET results.
+"""
+
+from collections import OrderedDict
+import time
+from typing import Any
+from typing import Dict
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+# Suggested time to live, in seconds, of slowly changing endpoints
+DEFAULT_CACHE_TTLS: Dict[str, float] = {
+    "system/": 5,
+    "connection/config/": 30,
+    "lan/config/": 30,
+    "tv/channels/": 300,
+    "tv/bouquets/": 300,
+}
+
+
+class ResponseCache:
+    """
+    LRU cache of GET results with a time to live per path prefix
+
+    ttls : `dict`
+        Time to live in seconds by path prefix, the longest prefix matching a
+        path is used. Paths matching no prefix use default_ttl.
+    default_ttl : `float`
+        Default to 0, paths without a matching prefix are not cached
+    max_entries : `int`
+        Default to 256, least recently used entries are evicted beyond
+
+    Writes (POST, PUT, DELETE) invalidate every entry of the same API
+    (first path segment), e.g. a PUT on lan/config/ drops lan/browser/pub.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Mapping[str, float]] = None,
+        default_ttl: float = 0,
+        max_entries: int = 256,
+    ) -> None:
+        if ttls is None:
+            ttls = DEFAULT_CACHE_TTLS
+        self.ttls = sorted(ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        # Incremented on each invalidation, results fetched before are not stored
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl(self, path: str) -> float:
+        """
+        Returns the time to live of the given path
+        """
+        for prefix, ttl in self.ttls:
+            if path.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    def get(self, path: str) -> Tuple[bool, Any]:
+        """
+        Returns (found, value) for the given path
+        """
+        entry = self._entries.get(path)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return (True, value)
+            del self._entries[path]
+        self.misses += 1
+        return (False, None)
+
+    def set(self, path: str, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Store the value of the given path
+
+        generation : `int`, optional
+            Cache generation read before fetching the value, the value is
+            dropped if the cache has been invalidated since.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttl(path)
+        if ttl <= 0:
+            return
+        self._entries[path] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, path: str) -> None:
+        """
+        Drop the entries of the API the given path belongs to
+        """
+        self.generation += 1
+        root = resource_root(path)
+        for key in [key for key in self._entries if resource_root(key) == root]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def copy(self) -> "ResponseCache":
+        """
+        Returns an empty cache with the same settings
+        """
+        return ResponseCache(dict(self.ttls), self.default_ttl, self.max_entries)
+
+    def clear(self) -> None:
+        """
+        Drop all the entries
+        """
+        self.generation += 1
+        self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit, miss, eviction and invalidation counts
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def resource_root(path: str) -> str:
+    """
+    Returns the API a path belongs to, its first segment, e.g. "lan"
+    """
+    return path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
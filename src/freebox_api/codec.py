@@ -0,0 +1,122 @@
+"""
+JSON codecs used to encode request payloads and decode API responses.
+
+The fastest installed library among orjson, msgspec and ujson is used by
+default, the standard library json module otherwise.
+"""
+
+import json
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Type
+from typing import Union
+
+
+class JsonCodec:
+    """
+    JSON codec based on the standard library
+    """
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:
+        """
+        Serialize obj to a JSON string
+        """
+        return json.dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Deserialize JSON raw bytes or string
+        """
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    JSON codec based on orjson
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> str:
+        return self._orjson.dumps(obj, option=self._orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    """
+    JSON codec based on msgspec
+    """
+
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> str:
+        return self._encoder.encode(obj).decode()  # type: ignore
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._decoder.decode(data)
+
+
+class UjsonCodec(JsonCodec):
+    """
+    JSON codec based on ujson
+    """
+
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson
+
+        self._ujson = ujson
+
+    def dumps(self, obj: Any) -> str:
+        return self._ujson.dumps(obj)  # type: ignore
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._ujson.loads(data)
+
+
+# Available codecs, by order of preference
+CODECS: Dict[str, Type[JsonCodec]] = {
+    OrjsonCodec.name: OrjsonCodec,
+    MsgspecCodec.name: MsgspecCodec,
+    UjsonCodec.name: UjsonCodec,
+    JsonCodec.name: JsonCodec,
+}
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """
+    Returns the codec with the given name, or the fastest installed one
+
+    name : `str`, optional
+        One of orjson, msgspec, ujson or json. ImportError is raised if the
+        library is not installed.
+        Default to None
+    """
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError(f"Unknown JSON codec: {name}")
+        return CODECS[name]()
+
+    for codec_class in CODECS.values():
+        try:
+            return codec_class()
+        except ImportError:
+            continue
+    return JsonCodec()  # pragma: no cover
@@ -0,0 +1,153 @@
+"""
+Change detection between successive results of a polled endpoint.
+"""
+
+from typing import Any
+from typing import Callable
+from typing import Collection
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Literal
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+from typing import TypedDict
+from typing import Union
+
+# Field or function returning the stable identifier of a record
+RecordKey = Union[str, Callable[[Mapping[str, Any]], Hashable]]
+
+
+class Change(TypedDict):
+    """
+    Change of one record between two updates.
+
+    kind : `str` – "added", "removed" or "changed"
+    key : `Hashable` – Stable identifier of the record
+    record : `dict` – New record, the last known one if removed
+    fields : `dict` – (old, new) values by dotted field path of a changed
+    record, e.g. {"status": ("downloading", "done")}, empty otherwise
+    """
+
+    kind: Literal["added", "removed", "changed"]
+    key: Hashable
+    record: Mapping[str, Any]
+    fields: Dict[str, Tuple[Any, Any]]
+
+
+def diff_fields(
+    old: Mapping[str, Any], new: Mapping[str, Any], prefix: str = ""
+) -> Dict[str, Tuple[Any, Any]]:
+    """
+    Returns the (old, new) values of the fields differing between two records,
+    by dotted path for the fields of nested objects. Missing values are None.
+    """
+    deltas: Dict[str, Tuple[Any, Any]] = {}
+    for field in old.keys() | new.keys():
+        old_value = old.get(field)
+        new_value = new.get(field)
+        if old_value == new_value:
+            continue
+        if isinstance(old_value, Mapping) and isinstance(new_value, Mapping):
+            deltas.update(diff_fields(old_value, new_value, f"{prefix}{field}."))
+        else:
+            deltas[f"{prefix}{field}"] = (old_value, new_value)
+    return deltas
+
+
+class DiffEngine:
+    """
+    Tracks the records of a polled endpoint by stable identifier and returns
+    only the ones added, removed or changed since the previous update.
+
+    Unchanged records are skipped with one dict comparison. The previous
+    state is a shallow copy of the records of the last update: changing their
+    fields afterwards doesn't hide a change, nested objects are shared though.
+
+    key : `str` or `callable`
+        Default to "id" (host, download, lease and redirection ids), field or
+        function giving the stable identifier of a record
+    ignore : `list`, optional
+        Top level fields not tracked, e.g. ["last_activity"] for LAN hosts
+    """
+
+    def __init__(
+        self, key: RecordKey = "id", ignore: Optional[Collection[str]] = None
+    ) -> None:
+        self.key = key
+        self.ignore = frozenset(ignore or ())
+        self._records: Dict[Hashable, Dict[str, Any]] = {}
+        self._listeners: List[Callable[[List[Change]], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def records(self) -> Dict[Hashable, Mapping[str, Any]]:
+        """
+        Returns the current records by key, without the ignored fields
+        """
+        return dict(self._records)
+
+    def add_listener(self, listener: Callable[[List[Change]], None]) -> None:
+        """
+        Register a callable receiving the changes of each update having some
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[List[Change]], None]) -> None:
+        """
+        Unregister a listener added with add_listener()
+        """
+        self._listeners.remove(listener)
+
+    def update(self, records: Optional[Iterable[Mapping[str, Any]]]) -> List[Change]:
+        """
+        Returns the changes since the previous update and makes records the
+        current state. None, as returned by the API for an empty list, is
+        handled as no record.
+        """
+        previous = self._records
+        current: Dict[Hashable, Dict[str, Any]] = {}
+        changes: List[Change] = []
+        for record in records or ():
+            record = {k: v for k, v in record.items() if k not in self.ignore}
+            key = self._key(record)
+            current[key] = record
+            old = previous.get(key)
+            if old is None:
+                changes.append(
+                    {"kind": "added", "key": key, "record": record, "fields": {}}
+                )
+            elif old != record:
+                changes.append(
+                    {
+                        "kind": "changed",
+                        "key": key,
+                        "record": record,
+                        "fields": diff_fields(old, record),
+                    }
+                )
+        for key, old in previous.items():
+            if key not in current:
+                changes.append(
+                    {"kind": "removed", "key": key, "record": old, "fields": {}}
+                )
+        self._records = current
+        if changes:
+            for listener in self._listeners:
+                listener(changes)
+        return changes
+
+    def reset(self) -> None:
+        """
+        Forget the current state, the next update reports every record added
+        """
+        self._records = {}
+
+    def _key(self, record: Mapping[str, Any]) -> Hashable:
+        if callable(self.key):
+            return self.key(record)
+        return record[self.key]  # type: ignore
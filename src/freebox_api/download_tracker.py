@@ -0,0 +1,267 @@
+"""
+Incremental tracking of the download tasks, reporting their changes only.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Literal
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+from typing import TypedDict
+
+from freebox_api.api.download import Download
+from freebox_api.diff import Change
+from freebox_api.diff import DiffEngine
+
+logger = logging.getLogger(__name__)
+
+# Fields kept for each task, the other ones are only passed along in events
+_TRACKED_FIELDS = ("id", "status", "rx_bytes", "tx_bytes")
+
+
+class DownloadEvent(TypedDict):
+    """
+    Change of a download task between two polls.
+
+    kind : `str` – "added", "removed", "status" if the status changed (see
+    Download.download_state), "progress" if only the byte counters moved
+    id : `int` – Download task id
+    task : `dict` – Task as returned by the API, the last known one if removed
+    status : `str` – Current status
+    previous_status : `str` – Status at the previous poll, None if added
+    rx_delta : `int` – Bytes received since the previous poll
+    tx_delta : `int` – Bytes sent since the previous poll
+    rx_rate : `float` – Bytes per second received between the two polls
+    tx_rate : `float` – Bytes per second sent between the two polls
+    rx_rate_smoothed : `float` – Exponentially weighted moving average of rx_rate
+    tx_rate_smoothed : `float` – Exponentially weighted moving average of tx_rate
+    """
+
+    kind: Literal["added", "removed", "status", "progress"]
+    id: int
+    task: Mapping[str, Any]
+    status: str
+    previous_status: Optional[str]
+    rx_delta: int
+    tx_delta: int
+    rx_rate: float
+    tx_rate: float
+    rx_rate_smoothed: float
+    tx_rate_smoothed: float
+
+
+class _Rates:
+    __slots__ = ("rx", "tx")
+
+    def __init__(self) -> None:
+        self.rx = 0.0
+        self.tx = 0.0
+
+
+class DownloadTracker:
+    """
+    Polls the download tasks and reports the added and removed ones, status
+    changes and progress. Only the id, status and byte counters of each task
+    are kept between polls.
+
+    The polling interval is min_interval while tasks change, and grows by
+    backoff up to max_interval while nothing changes.
+
+    download : `Download`
+        Download API module, e.g. fbx.download
+    min_interval : `float`
+        Default to 1, seconds between polls while tasks change
+    max_interval : `float`
+        Default to 30, seconds between polls when idle
+    backoff : `float`
+        Default to 1.5, interval growth after a poll without change
+    smoothing : `float`
+        Default to 5, time constant in seconds of the smoothed rates. They
+        are updated on every poll and decay while a task is stalled.
+    """
+
+    def __init__(
+        self,
+        download: Download,
+        min_interval: float = 1,
+        max_interval: float = 30,
+        backoff: float = 1.5,
+        smoothing: float = 5,
+    ) -> None:
+        self.download = download
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self._engine = DiffEngine()
+        self._rates: Dict[int, _Rates] = {}
+        self._polled_at: Optional[float] = None
+        self._listeners: List[Callable[[List[DownloadEvent]], None]] = []
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.polls = 0
+
+    def add_listener(self, listener: Callable[[List[DownloadEvent]], None]) -> None:
+        """
+        Register a callable receiving the events of each poll having some
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[List[DownloadEvent]], None]) -> None:
+        """
+        Unregister a listener added with add_listener()
+        """
+        self._listeners.remove(listener)
+
+    async def poll(self) -> List[DownloadEvent]:
+        """
+        Get the download tasks once, returns and emits their changes
+        """
+        tasks = await self.download.get_download_tasks()
+        now = time.monotonic()
+        elapsed = now - self._polled_at if self._polled_at is not None else 0.0
+        self._polled_at = now
+        self.polls += 1
+
+        by_id: Dict[Any, Mapping[str, Any]] = {task["id"]: task for task in tasks or ()}
+        changes = self._engine.update(
+            {field: task.get(field) for field in _TRACKED_FIELDS}
+            for task in by_id.values()
+        )
+        events = [self._event(change, by_id, elapsed) for change in changes]
+        # The tasks without change moved no byte, their rates decay
+        changed = {event["id"] for event in events}
+        for download_id, rates in self._rates.items():
+            if download_id not in changed:
+                self._smooth(rates, 0.0, 0.0, elapsed)
+
+        if events:
+            self.interval = self.min_interval
+            for listener in self._listeners:
+                listener(events)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return events
+
+    def start(self) -> None:
+        """
+        Start polling in a background task
+        """
+        if self._task is None or self._task.done():
+            # Created here, not in _run(), so a wakeup() right after start()
+            # isn't lost, and not in __init__() to bind to the running loop
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run(self._wakeup))
+
+    async def stop(self) -> None:
+        """
+        Stop the background polling
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wakeup(self) -> None:
+        """
+        Poll now and go back to min_interval, e.g. after adding a task
+        """
+        self.interval = self.min_interval
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def rates(self, download_id: int) -> Optional[Dict[str, float]]:
+        """
+        Returns the smoothed rates of a tracked task, None if unknown
+        """
+        rates = self._rates.get(download_id)
+        if rates is None:
+            return None
+        return {"rx_rate": rates.rx, "tx_rate": rates.tx}
+
+    async def _run(self, wakeup: asyncio.Event) -> None:
+        while True:
+            # Cleared before the poll: a wakeup() during the poll triggers
+            # the next one
+            wakeup.clear()
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Polling the download tasks failed")
+                self.interval = self.max_interval
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _event(
+        self, change: Change, by_id: Mapping[Any, Mapping[str, Any]], elapsed: float
+    ) -> DownloadEvent:
+        record = change["record"]
+        download_id = record["id"]
+        fields = change["fields"]
+        event: DownloadEvent = {
+            "kind": "progress",
+            "id": download_id,
+            "task": by_id.get(download_id, record),
+            "status": record["status"],
+            "previous_status": record["status"],
+            "rx_delta": 0,
+            "tx_delta": 0,
+            "rx_rate": 0.0,
+            "tx_rate": 0.0,
+            "rx_rate_smoothed": 0.0,
+            "tx_rate_smoothed": 0.0,
+        }
+        if change["kind"] == "added":
+            event["kind"] = "added"
+            event["previous_status"] = None
+            self._rates[download_id] = _Rates()
+            return event
+        if change["kind"] == "removed":
+            event["kind"] = "removed"
+            self._rates.pop(download_id, None)
+            return event
+
+        if "status" in fields:
+            event["kind"] = "status"
+            event["previous_status"] = fields["status"][0]
+        event["rx_delta"] = _delta(fields.get("rx_bytes"))
+        event["tx_delta"] = _delta(fields.get("tx_bytes"))
+        rates = self._rates.setdefault(download_id, _Rates())
+        if elapsed > 0:
+            event["rx_rate"] = event["rx_delta"] / elapsed
+            event["tx_rate"] = event["tx_delta"] / elapsed
+        self._smooth(rates, event["rx_rate"], event["tx_rate"], elapsed)
+        event["rx_rate_smoothed"] = rates.rx
+        event["tx_rate_smoothed"] = rates.tx
+        return event
+
+    def _smooth(
+        self, rates: _Rates, rx_rate: float, tx_rate: float, elapsed: float
+    ) -> None:
+        if elapsed <= 0:
+            return
+        # Time based weight, the polling interval varies
+        weight = 1 - math.exp(-elapsed / self.smoothing) if self.smoothing else 1
+        rates.rx += weight * (rx_rate - rates.rx)
+        rates.tx += weight * (tx_rate - rates.tx)
+
+
+def _delta(values: Optional[Tuple[Any, Any]]) -> int:
+    if values is None:
+        return 0
+    old, new = values
+    return int((new or 0) - (old or 0))
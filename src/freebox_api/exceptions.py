@@ -21,3 +21,8 @@ class HttpRequestError(Exception):
 class InsufficientPermissionsError(HttpRequestError):
     def __init__(self, *args, **kwargs):
         HttpRequestError.__init__(self, *args, **kwargs)
+
+
+class ChecksumError(Exception):
+    def __init__(self, *args, **kwargs):
+        Exception.__init__(self, *args, **kwargs)
@@ -0,0 +1,187 @@
+"""
+Request instrumentation: events emitted by Access and an in-memory aggregator.
+"""
+
+from bisect import bisect_left
+import re
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TypedDict
+
+# Path segments following these prefixes are base64 encoded file paths
+_BASE64_PATH_PREFIXES = ("fs/ls/", "fs/info/", "dl/", "share_link/")
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|uuid-\S+|.*:.*)$",
+    re.IGNORECASE,
+)
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+class RequestEvent(TypedDict):
+    """
+    Event emitted by Access for each request sent to the Freebox.
+
+    method : `str` – HTTP method
+    path : `str` – API path with identifiers replaced, e.g. downloads/{id}/files/
+    status : `int` – HTTP status of the last response, 0 if none was received
+    bytes_in : `int` – Response bytes received
+    bytes_out : `int` – Request body bytes sent
+    duration : `float` – Seconds from the call to the result, login included
+    queue_time : `float` – Seconds waited for the scheduler and rate limiter
+    retries : `int` – Retries of transient failures
+    refreshes : `int` – Session refreshes waited for
+    error : `str` – Exception class name if the request failed, None otherwise
+    """
+
+    method: str
+    path: str
+    status: int
+    bytes_in: int
+    bytes_out: int
+    duration: float
+    queue_time: float
+    retries: int
+    refreshes: int
+    error: Optional[str]
+
+
+def template_path(end_url: str) -> str:
+    """
+    Returns the API path with the identifiers replaced by placeholders
+    """
+    path = end_url.split("?", 1)[0]
+    for prefix in _BASE64_PATH_PREFIXES:
+        if path.startswith(prefix) and len(path) > len(prefix):
+            return prefix + "{path}"
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")
+    )
+
+
+class _Series:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queue_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors = 0
+        self.retries = 0
+        self.refreshes = 0
+
+
+class MetricsCollector:
+    """
+    Aggregates request events in memory by method and templated path.
+
+    Register it with Access.add_listener() (or the request_listeners argument of
+    Freepybox) and dump it with to_prometheus().
+
+    buckets : `tuple[float]`
+        Upper bounds in seconds of the duration histogram buckets
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, str], _Series] = {}
+
+    def __call__(self, event: RequestEvent) -> None:
+        key = (event["method"], event["path"])
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self.buckets)
+        series.bucket_counts[bisect_left(self.buckets, event["duration"])] += 1
+        series.count += 1
+        series.duration += event["duration"]
+        series.queue_time += event["queue_time"]
+        series.bytes_in += event["bytes_in"]
+        series.bytes_out += event["bytes_out"]
+        series.retries += event["retries"]
+        series.refreshes += event["refreshes"]
+        if event["error"] is not None:
+            series.errors += 1
+
+    def reset(self) -> None:
+        """
+        Drop the collected metrics
+        """
+        self._series.clear()
+
+    def top(self, count: int = 10) -> List[Dict[str, object]]:
+        """
+        Returns the endpoints which spent the most time in requests
+        """
+        endpoints = sorted(
+            self._series.items(), key=lambda item: item[1].duration, reverse=True
+        )
+        return [
+            {
+                "method": method,
+                "path": path,
+                "count": series.count,
+                "duration": series.duration,
+                "mean": series.duration / series.count,
+                "bytes_in": series.bytes_in,
+                "errors": series.errors,
+            }
+            for (method, path), series in endpoints[:count]
+        ]
+
+    def to_prometheus(self, prefix: str = "freebox_api") -> str:
+        """
+        Returns the metrics in Prometheus text exposition format
+        """
+        counters = (
+            ("requests_total", "Requests sent", "count"),
+            ("request_errors_total", "Failed requests", "errors"),
+            ("request_retries_total", "Retries of transient failures", "retries"),
+            ("session_refreshes_total", "Session refreshes waited", "refreshes"),
+            ("received_bytes_total", "Response bytes received", "bytes_in"),
+            ("sent_bytes_total", "Request body bytes sent", "bytes_out"),
+            ("queue_seconds_total", "Seconds waited in queue", "queue_time"),
+        )
+        lines: List[str] = []
+        name = f"{prefix}_request_duration_seconds"
+        lines.append(f"# HELP {name} Request duration in seconds")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, path), series in sorted(self._series.items()):
+            labels = f'method="{method}",path="{_escape(path)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*self.buckets, "+Inf"), series.bucket_counts
+            ):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {series.duration}")
+            lines.append(f"{name}_count{{{labels}}} {series.count}")
+
+        for suffix, help_text, attribute in counters:
+            name = f"{prefix}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (method, path), series in sorted(self._series.items()):
+                labels = f'method="{method}",path="{_escape(path)}"'
+                lines.append(f"{name}{{{labels}}} {getattr(series, attribute)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
@@ -0,0 +1,293 @@
+"""
+Connection manager of a fleet of Freeboxes sharing one HTTP session.
+"""
+
+import asyncio
+from functools import reduce
+import logging
+from os import path
+import time
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from aiohttp import ClientSession
+from aiohttp import TCPConnector
+
+from freebox_api.aiofreepybox import ConnectorOptions
+from freebox_api.aiofreepybox import DEFAULT_TOKEN_DIRECTORY
+from freebox_api.aiofreepybox import DEFAULT_TOKEN_FILENAME
+from freebox_api.aiofreepybox import Freepybox
+from freebox_api.ratelimit import RateLimit
+from freebox_api.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# A coroutine function called with the Freepybox, or the dotted name of an API
+# method, e.g. "connection.get_status"
+BoxCall = Union[str, Callable[..., Awaitable[Any]]]
+
+
+class _Box:
+    def __init__(self, host: str, port: str, options: Dict[str, Any]) -> None:
+        self.host = host
+        self.port = port
+        self.options = options
+        self.fbx: Optional[Freepybox] = None
+        # Single in-flight open shared by the concurrent users of the box
+        self.opening: Optional["asyncio.Future[Freepybox]"] = None
+        self.active = 0
+        self.last_used = time.monotonic()
+
+
+class FreeboxPool:
+    """
+    Holds many Freeboxes on a shared session and connection pool, opening
+    each of them on first use and closing the ones left idle
+
+    max_concurrency : `int`
+        Default to 32, maximum number of requests in flight over all the boxes,
+        and of boxes called at once by fan_out()
+    box_rate_limit : `dict`, optional
+        Rate limits of each box, see RateLimit, e.g. {"rate": 5, "burst": 10}.
+        Default to None, only the global limit applies.
+    idle_timeout : `float`, optional
+        Default to 300, seconds after which an unused box is closed.
+        None to keep the boxes open until close().
+    connector_options : `ConnectorOptions`, optional
+        Options of the shared connection pool
+    freepybox_options
+        Default Freepybox arguments of the boxes, e.g. app_desc or timeout.
+        Each box gets an empty copy of the response_cache. A token_store
+        holds the tokens of a single box: give it to add() instead.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        box_rate_limit: Optional[RateLimit] = None,
+        idle_timeout: Optional[float] = 300,
+        connector_options: Optional[ConnectorOptions] = None,
+        **freepybox_options: Any,
+    ) -> None:
+        if "token_store" in freepybox_options:
+            raise ValueError("A token store belongs to one box, give it to add()")
+        self.max_concurrency = max_concurrency
+        self.box_rate_limit: RateLimit = box_rate_limit or {}
+        self.idle_timeout = idle_timeout
+        self.connector_options: ConnectorOptions = connector_options or {}
+        self.freepybox_options = freepybox_options
+        self.limiter = RateLimiter(max_in_flight=max_concurrency)
+        self._boxes: Dict[str, _Box] = {}
+        self._session: Optional[ClientSession] = None
+        self._reaper: Optional["asyncio.Task[None]"] = None
+        self.opens = 0
+        self.idle_closes = 0
+
+    def add(self, name: str, host: str, port: str = "443", **options: Any) -> None:
+        """
+        Register a Freebox, opened on first use
+
+        name : `str`
+            Name of the box in the pool
+        options
+            Freepybox arguments of this box, overriding the pool ones.
+            Default token_file is app_auth_<name> in the default directory.
+        """
+        if name in self._boxes:
+            raise ValueError(f"Freebox {name!r} is already in the pool")
+        shared_cache = self.freepybox_options.get("response_cache")
+        if shared_cache is not None and "response_cache" not in options:
+            # Cache entries are keyed by path, the boxes can't share them
+            options["response_cache"] = shared_cache.copy()
+        options = {**self.freepybox_options, **options}
+        if "token_file" not in options and "token_store" not in options:
+            options["token_file"] = path.join(
+                DEFAULT_TOKEN_DIRECTORY, f"{DEFAULT_TOKEN_FILENAME}_{name}"
+            )
+        self._boxes[name] = _Box(host, port, options)
+
+    async def remove(self, name: str) -> None:
+        """
+        Close a Freebox and remove it from the pool
+        """
+        await self._close_box(self._boxes.pop(name))
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Returns the names of the boxes in the pool
+        """
+        return list(self._boxes)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._boxes
+
+    async def get(self, name: str) -> Freepybox:
+        """
+        Returns the open Freepybox of the given box, opening it if needed.
+
+        An idle box is closed after idle_timeout: get it again from the pool
+        rather than keeping the returned object around.
+        """
+        box = self._boxes[name]
+        box.last_used = time.monotonic()
+        if box.fbx is not None:
+            return box.fbx
+        if box.opening is None:
+            box.opening = asyncio.ensure_future(self._open_box(box))
+        try:
+            return await asyncio.shield(box.opening)
+        finally:
+            box.last_used = time.monotonic()
+
+    async def call(self, name: str, call: BoxCall, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run the call on the given box and returns its result
+
+        call : `str` or coroutine function
+            Dotted name of an API method, e.g. "connection.get_status", called
+            with args and kwargs. Or a coroutine function called with the
+            Freepybox then args and kwargs.
+        """
+        box = self._boxes[name]
+        box.active += 1
+        try:
+            fbx = await self.get(name)
+            if isinstance(call, str):
+                method: Any = reduce(getattr, call.split("."), fbx)
+                return await method(*args, **kwargs)
+            return await call(fbx, *args, **kwargs)
+        finally:
+            box.active -= 1
+            box.last_used = time.monotonic()
+
+    async def fan_out(
+        self,
+        call: BoxCall,
+        *args: Any,
+        names: Optional[Iterable[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run the same call on many boxes, yields (name, result) as they complete.
+        The result is the exception raised if the call failed on that box.
+
+            async for name, status in pool.fan_out("connection.get_status"):
+                ...
+
+        names : `list`, optional
+            Default to None, all the boxes of the pool
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(name: str) -> Tuple[str, Any]:
+            async with semaphore:
+                try:
+                    return (name, await self.call(name, call, *args, **kwargs))
+                except Exception as err:
+                    return (name, err)
+
+        tasks = [
+            asyncio.ensure_future(run(name))
+            for name in (self.names if names is None else names)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        """
+        Close all the boxes and the shared session
+        """
+        reaper, self._reaper = self._reaper, None
+        if reaper is not None:
+            reaper.cancel()
+            await asyncio.gather(reaper, return_exceptions=True)
+        await asyncio.gather(*(self._close_box(box) for box in self._boxes.values()))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def close_idle(self) -> int:
+        """
+        Close the boxes unused for idle_timeout seconds, returns their number.
+        Called periodically once a box is open.
+        """
+        if not self.idle_timeout:
+            return 0
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [
+            box
+            for box in self._boxes.values()
+            if box.fbx is not None and not box.active and box.last_used < deadline
+        ]
+        self.idle_closes += len(idle)
+        await asyncio.gather(*(self._close_box(box) for box in idle))
+        return len(idle)
+
+    async def __aenter__(self) -> "FreeboxPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of boxes, open boxes, opens and idle closes
+        """
+        return {
+            "boxes": len(self._boxes),
+            "open": sum(1 for box in self._boxes.values() if box.fbx is not None),
+            "opens": self.opens,
+            "idle_closes": self.idle_closes,
+        }
+
+    async def _open_box(self, box: _Box) -> Freepybox:
+        try:
+            if self._session is None:
+                self._session = ClientSession(
+                    connector=TCPConnector(**self.connector_options)
+                )
+            options = dict(box.options)
+            options.setdefault(
+                "rate_limiter", RateLimiter(**self.box_rate_limit, parent=self.limiter)
+            )
+            fbx = Freepybox(**options)
+            await fbx.open(box.host, box.port, session=self._session)
+            box.fbx = fbx
+            self.opens += 1
+        finally:
+            box.opening = None
+        if self.idle_timeout and (self._reaper is None or self._reaper.done()):
+            self._reaper = asyncio.ensure_future(self._close_idle_boxes())
+        return fbx
+
+    async def _close_box(self, box: _Box) -> None:
+        fbx, box.fbx = box.fbx, None
+        if fbx is None:
+            return
+        try:
+            await fbx.close()
+        except Exception as err:
+            logger.warning("Closing %s failed: %s", box.host, err)
+
+    async def _close_idle_boxes(self) -> None:
+        while self.idle_timeout:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self.close_idle()
@@ -0,0 +1,203 @@
+"""
+Client-side rate limiting of the requests sent to the Freebox.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+import time
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import TypedDict
+
+
+class RateLimit(TypedDict, total=False):
+    """
+    Limits applied to a family of endpoints.
+
+    rate : `float` – Requests per second
+    burst : `int` – Requests allowed at once above the rate (default to rate)
+    max_in_flight : `int` – Maximum number of concurrent requests
+    """
+
+    rate: float
+    burst: int
+    max_in_flight: int
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate requests per second with bursts of burst requests
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        """
+        Wait for a token, waiters are served in order
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Gate:
+    """
+    Rate and concurrency limits of one family, and its queue statistics
+    """
+
+    def __init__(self, limit: RateLimit) -> None:
+        self.bucket = (
+            TokenBucket(limit["rate"], limit.get("burst")) if "rate" in limit else None
+        )
+        self.max_in_flight = limit.get("max_in_flight")
+        # Created on first use to bind to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.queued = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def enter(self) -> float:
+        start = time.monotonic()
+        if self.max_in_flight:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            await self._semaphore.acquire()
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+        except BaseException:
+            self.exit()
+            raise
+        self.in_flight += 1
+        return time.monotonic() - start
+
+    def exit(self) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def record(self, waited: float) -> None:
+        self.requests += 1
+        if waited > 0.001:
+            self.queued += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "wait_time_total": self.wait_time_total,
+            "wait_time_max": self.wait_time_max,
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter and concurrency governor for Freebox requests
+
+    rate, burst, max_in_flight : global limits, see RateLimit. None for no limit
+    families : `dict`, optional
+        Additional limits by path prefix, e.g. {"fs/": {"max_in_flight": 2}}.
+        The longest prefix matching a path applies.
+    parent : `RateLimiter`, optional
+        Limiter shared with other ones, e.g. by the Freeboxes of a pool
+
+    Requests wait for their family limits first, then for the global ones,
+    then for the parent limiter.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        families: Optional[Mapping[str, RateLimit]] = None,
+        parent: Optional["RateLimiter"] = None,
+    ) -> None:
+        limit: RateLimit = {}
+        if rate is not None:
+            limit["rate"] = rate
+        if burst is not None:
+            limit["burst"] = burst
+        if max_in_flight is not None:
+            limit["max_in_flight"] = max_in_flight
+        self._global = _Gate(limit)
+        self.parent = parent
+        self._families: Dict[str, _Gate] = {
+            prefix: _Gate(family_limit)
+            for prefix, family_limit in sorted(
+                (families or {}).items(), key=lambda item: len(item[0]), reverse=True
+            )
+        }
+
+    def family(self, path: str) -> Optional[str]:
+        """
+        Returns the family prefix the given path belongs to
+        """
+        for prefix in self._families:
+            if path.startswith(prefix):
+                return prefix
+        return None
+
+    @asynccontextmanager
+    async def acquire(self, path: str) -> AsyncIterator[float]:
+        """
+        Hold a request slot for the given path, yields the queue wait in seconds
+        """
+        gates: List[_Gate] = []
+        family = self.family(path)
+        if family is not None:
+            gates.append(self._families[family])
+        gates.append(self._global)
+
+        waited = 0.0
+        entered: List[_Gate] = []
+        async with AsyncExitStack() as stack:
+            try:
+                for gate in gates:
+                    waited += await gate.enter()
+                    entered.append(gate)
+                if self.parent is not None:
+                    waited += await stack.enter_async_context(self.parent.acquire(path))
+                for gate in gates:
+                    gate.record(waited)
+                yield waited
+            finally:
+                for gate in entered:
+                    gate.in_flight -= 1
+                    gate.exit()
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns request counts and queue wait times, globally and by family
+        """
+        stats = {"*": self._global.stats}
+        for prefix, gate in self._families.items():
+            stats[prefix] = gate.stats
+        return stats
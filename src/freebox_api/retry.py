@@ -0,0 +1,121 @@
+"""
+Retry policy for transient request failures.
+"""
+
+import asyncio
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+import random
+from typing import Collection
+from typing import Mapping
+from typing import Optional
+
+from aiohttp import ClientConnectionError
+from aiohttp import ClientPayloadError
+
+# The Freebox API uses PUT and POST for actions (reboot, format, check...),
+# only GET is retried by default
+DEFAULT_RETRY_METHODS = ("GET",)
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff retry policy for connection errors, timeouts and
+    server errors
+
+    max_attempts : `int`
+        Default to 3, total number of attempts including the first one
+    backoff_base : `float`
+        Default to 0.5, delay in seconds before the first retry, doubled for
+        each following retry
+    backoff_max : `float`
+        Default to 10, maximum delay in seconds between two attempts
+    jitter : `bool`
+        Default to True, wait a random delay between 0 and the backoff delay
+        so that clients don't retry in sync
+    max_elapsed : `float`, optional
+        Default to 30, no retry is attempted after this many seconds
+    methods : `list[str]`
+        HTTP methods which can be retried, default to GET only
+    statuses : `list[int]`
+        HTTP statuses which are retried, default to 429 and 5xx gateway errors
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10,
+        jitter: bool = True,
+        max_elapsed: Optional[float] = 30,
+        methods: Collection[str] = DEFAULT_RETRY_METHODS,
+        statuses: Collection[int] = DEFAULT_RETRY_STATUSES,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.methods = {method.upper() for method in methods}
+        self.statuses = set(statuses)
+
+    def allows(self, method: str) -> bool:
+        """
+        Returns True if requests with the given HTTP method can be retried
+        """
+        return method.upper() in self.methods
+
+    def is_retryable_status(self, status: int) -> bool:
+        """
+        Returns True if a response with the given HTTP status can be retried
+        """
+        return status in self.statuses
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        """
+        Returns True if the request failed on a transient error
+        """
+        return isinstance(
+            error, (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError)
+        )
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """
+        Returns the delay in seconds before the given retry (starting at 1)
+        """
+        backoff = min(self.backoff_max, self.backoff_base * 2.0 ** (retry - 1))
+        if self.jitter:
+            backoff = random.uniform(0, backoff)  # noqa: S311
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.backoff_max))
+        return backoff
+
+    def can_retry(self, retry: int, elapsed: float, delay: float) -> bool:
+        """
+        Returns True if the given retry (starting at 1) is within the budget
+        """
+        if retry >= self.max_attempts:
+            return False
+        return self.max_elapsed is None or elapsed + delay <= self.max_elapsed
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Returns the delay in seconds requested by a Retry-After header
+    """
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,203 @@
+"""
+Priority aware dispatch of the requests sent to the Freebox.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+import time
+from typing import AsyncIterator
+from typing import Collection
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+
+class Priority(IntEnum):
+    """
+    Request classes, from the most to the least urgent
+    """
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+# (path prefix, HTTP methods or None for all, priority), first match applies
+PriorityRule = Tuple[str, Optional[Collection[str]], Priority]
+
+DEFAULT_PRIORITY_RULES: List[PriorityRule] = [
+    ("player/", None, Priority.INTERACTIVE),
+    ("home/", ("PUT", "POST"), Priority.INTERACTIVE),
+    ("fs/ls/", None, Priority.BULK),
+    ("rrd/", None, Priority.BULK),
+]
+
+_request_priority: ContextVar[Optional[Priority]] = ContextVar(
+    "freebox_request_priority", default=None
+)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """
+    Send the requests made in this context with the given priority, e.g.:
+
+        with request_priority(Priority.BULK):
+            await fbx.fs.list_files("/Disque dur/")
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class _Waiter:
+    def __init__(self, priority: Priority, future: "asyncio.Future[None]") -> None:
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class PriorityScheduler:
+    """
+    Shares a fixed number of request slots between priority classes
+
+    slots : `int`
+        Default to 8, maximum number of concurrent requests
+    reserved : `dict`, optional
+        Slots kept for a class and the more urgent ones, default to 2 slots
+        for interactive requests. Normal requests can't use the interactive
+        slots, bulk requests can't use the interactive nor normal ones.
+    starvation_timeout : `float`
+        Default to 2, a request waiting longer is promoted one class for each
+        starvation_timeout seconds waited, up to normal: the interactive slots
+        stay free for interactive requests
+    rules : `list`, optional
+        Priority by path prefix and methods, default to DEFAULT_PRIORITY_RULES.
+        Unmatched requests are normal. request_priority() overrides the rules.
+    """
+
+    def __init__(
+        self,
+        slots: int = 8,
+        reserved: Optional[Mapping[Priority, int]] = None,
+        starvation_timeout: float = 2,
+        rules: Optional[Sequence[PriorityRule]] = None,
+    ) -> None:
+        if reserved is None:
+            reserved = {Priority.INTERACTIVE: 2}
+        if sum(reserved.values()) >= slots:
+            raise ValueError("Reserved slots must leave slots for bulk requests")
+        self.slots = slots
+        self.starvation_timeout = starvation_timeout
+        self.rules = list(DEFAULT_PRIORITY_RULES if rules is None else rules)
+        # Slots a class can use: the ones not reserved for more urgent classes
+        self._limits: Dict[Priority, int] = {
+            priority: slots
+            - sum(count for cls, count in reserved.items() if cls < priority)
+            for priority in Priority
+        }
+        self._waiters: List[_Waiter] = []
+        self.in_use = 0
+        self.requests: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self.promoted = 0
+        self.wait_time_total: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self.wait_time_max: Dict[Priority, float] = {p: 0.0 for p in Priority}
+
+    def classify(self, path: str, method: str) -> Priority:
+        """
+        Returns the priority of a request
+        """
+        priority = _request_priority.get()
+        if priority is not None:
+            return priority
+        method = method.upper()
+        for prefix, methods, rule_priority in self.rules:
+            if path.startswith(prefix) and (methods is None or method in methods):
+                return rule_priority
+        return Priority.NORMAL
+
+    @asynccontextmanager
+    async def acquire(self, path: str, method: str) -> AsyncIterator[float]:
+        """
+        Hold a request slot, yields the queue wait in seconds
+        """
+        priority = self.classify(path, method)
+        start = time.monotonic()
+        if self._waiters or self.in_use >= self._limits[priority]:
+            waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            self._dispatch()
+            try:
+                await waiter.future
+            except BaseException:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # The slot was granted while being cancelled, give it back
+                    self._release()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        else:
+            self.in_use += 1
+
+        waited = time.monotonic() - start
+        self.requests[priority] += 1
+        self.wait_time_total[priority] += waited
+        self.wait_time_max[priority] = max(self.wait_time_max[priority], waited)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self.in_use -= 1
+        self._dispatch()
+
+    def _effective_priority(self, waiter: _Waiter, now: float) -> Priority:
+        # Starved requests are promoted up to normal, never to interactive
+        if self.starvation_timeout <= 0 or waiter.priority <= Priority.NORMAL:
+            return waiter.priority
+        promotion = int((now - waiter.enqueued) / self.starvation_timeout)
+        return Priority(max(Priority.NORMAL, waiter.priority - promotion))
+
+    def _dispatch(self) -> None:
+        """
+        Grant free slots to the most urgent waiters, oldest first
+        """
+        now = time.monotonic()
+        while self._waiters:
+            waiter = min(
+                self._waiters,
+                key=lambda w: (self._effective_priority(w, now), w.enqueued),
+            )
+            priority = self._effective_priority(waiter, now)
+            if self.in_use >= self._limits[priority]:
+                return
+            self._waiters.remove(waiter)
+            if priority != waiter.priority:
+                self.promoted += 1
+            self.in_use += 1
+            waiter.future.set_result(None)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns request counts and queue wait times by priority class
+        """
+        return {
+            priority.name.lower(): {
+                "requests": self.requests[priority],
+                "waiting": sum(1 for w in self._waiters if w.priority == priority),
+                "wait_time_total": self.wait_time_total[priority],
+                "wait_time_max": self.wait_time_max[priority],
+            }
+            for priority in Priority
+        }
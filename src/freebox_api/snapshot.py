@@ -0,0 +1,149 @@
+"""
+Inventory snapshot of a Freebox, collected by calling its read-only getters
+concurrently.
+"""
+
+import asyncio
+from functools import partial
+from functools import reduce
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import TypedDict
+
+from freebox_api.batch import run_batch
+from freebox_api.constants import PERMISSION_EXPLORER
+from freebox_api.constants import PERMISSION_SETTINGS
+from freebox_api.exceptions import InsufficientPermissionsError
+
+if TYPE_CHECKING:
+    from freebox_api.aiofreepybox import Freepybox
+
+# (dotted getter name, permission required or None), getters without argument
+SnapshotGetter = Tuple[str, Optional[str]]
+
+DEFAULT_SNAPSHOT_GETTERS: List[SnapshotGetter] = [
+    ("system.get_config", None),
+    ("connection.get_config", None),
+    ("connection.get_status", None),
+    ("connection.get_xdsl", None),
+    ("connection.get_ftth", None),
+    ("connection.get_lte_config", None),
+    ("connection.get_connection_logs", None),
+    ("lan.get_config", None),
+    ("lan.get_interfaces", None),
+    ("lan.get_hosts_list", None),
+    ("dhcp.get_config", None),
+    ("dhcp.get_v6_config", None),
+    ("dhcp.get_dhcp_dynamic_leases", None),
+    ("dhcp.get_dhcp_static_leases", None),
+    ("wifi.get_global_config", None),
+    ("wifi.get_ap_list", None),
+    ("wifi.get_bss", None),
+    ("wifi.get_wifi_planning", None),
+    ("wifi.get_wifi_mac_filters", None),
+    ("wifi.get_wifi_custom_keys", PERMISSION_SETTINGS),
+    ("switch.get_status", None),
+    ("storage.get_config", PERMISSION_EXPLORER),
+    ("storage.get_disks", PERMISSION_EXPLORER),
+    ("storage.get_raids", PERMISSION_EXPLORER),
+    ("fw.get_dmz_configuration", None),
+    ("fw.get_all_port_forwarding_configuration", None),
+    ("fw.get_all_incoming_port_configuration", None),
+    ("upnpigd.get_configuration", None),
+    ("upnpigd.get_redirs", None),
+    ("netshare.get_samba_configuration", None),
+    ("netshare.get_afp_configuration", None),
+    ("lcd.get_configuration", None),
+    ("freeplug.get_freeplug_networks", None),
+]
+
+
+class Snapshot(TypedDict):
+    """
+    Snapshot of a Freebox.
+
+    taken_at : `float` – Unix time the snapshot started
+    duration : `float` – Seconds taken by the snapshot
+    data : `dict` – Results by module then getter without its get_ prefix,
+    e.g. data["connection"]["status"]
+    timings : `dict` – Seconds taken by each called getter, by dotted name
+    skipped : `dict` – Reason of the getters not called or denied, by name
+    errors : `dict` – Error of the failed getters, by name
+    """
+
+    taken_at: float
+    duration: float
+    data: Dict[str, Dict[str, Any]]
+    timings: Dict[str, float]
+    skipped: Dict[str, str]
+    errors: Dict[str, str]
+
+
+async def take_snapshot(
+    fbx: "Freepybox",
+    getters: Sequence[SnapshotGetter] = DEFAULT_SNAPSHOT_GETTERS,
+    budget: float = 10,
+    max_concurrency: Optional[int] = None,
+) -> Snapshot:
+    """
+    Call the read-only getters of an open Freebox concurrently and returns
+    their results in one document
+
+    getters : `list`
+        Default to DEFAULT_SNAPSHOT_GETTERS, (dotted name, permission) of the
+        getters to call. The ones needing a permission the session lacks are
+        skipped.
+    budget : `float`
+        Default to 10, seconds after which the getters still running are
+        cancelled and reported as errors
+    max_concurrency : `int`, optional
+        Default to None, only the client limits apply
+    """
+    taken_at = time.time()
+    start = time.perf_counter()
+    permissions = await fbx.get_permissions() or {}
+    snapshot: Snapshot = {
+        "taken_at": taken_at,
+        "duration": 0.0,
+        "data": {},
+        "timings": {},
+        "skipped": {},
+        "errors": {},
+    }
+    names = []
+    for name, permission in getters:
+        if permission is not None and not permissions.get(permission):
+            snapshot["skipped"][name] = f"missing {permission} permission"
+        else:
+            names.append(name)
+
+    deadline = start + budget
+    batch = await run_batch(
+        {name: partial(_call_getter, fbx, name, deadline) for name in names},
+        max_concurrency,
+    )
+    for name, result in batch.results.items():
+        snapshot["timings"][name] = batch.latencies[name]
+        if isinstance(result, InsufficientPermissionsError):
+            snapshot["skipped"][name] = "insufficient_rights"
+        elif isinstance(result, asyncio.TimeoutError):
+            snapshot["errors"][name] = "budget exceeded"
+        elif isinstance(result, BaseException):
+            snapshot["errors"][name] = f"{type(result).__name__}: {result}"
+        else:
+            module, getter = name.split(".", 1)
+            key = getter[4:] if getter.startswith("get_") else getter
+            snapshot["data"].setdefault(module, {})[key] = result
+    snapshot["duration"] = time.perf_counter() - start
+    return snapshot
+
+
+async def _call_getter(fbx: "Freepybox", name: str, deadline: float) -> Any:
+    getter: Any = reduce(getattr, name.split("."), fbx)
+    return await asyncio.wait_for(getter(), max(0.0, deadline - time.perf_counter()))
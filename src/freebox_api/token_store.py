@@ -0,0 +1,220 @@
+"""
+Storage backends of the application token and of the persisted session.
+
+Each backend stores JSON documents by key: APP_TOKEN_KEY for the application
+token and its descriptor, SESSION_KEY for the session restored by
+Freepybox(persist_session=True).
+"""
+
+from abc import ABC
+from abc import abstractmethod
+import asyncio
+from contextlib import contextmanager
+import copy
+import json
+import logging
+import os
+import tempfile
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+APP_TOKEN_KEY = "app_token"
+SESSION_KEY = "session"
+
+
+class TokenStore(ABC):
+    """
+    Base class of the token storage backends
+    """
+
+    @abstractmethod
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the document stored under key, None if there is none
+        """
+
+    @abstractmethod
+    async def save(self, key: str, data: Dict[str, Any]) -> None:
+        """
+        Store the document under key, replacing the previous one
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Remove the document stored under key, if any
+        """
+
+
+class FileTokenStore(TokenStore):
+    """
+    Stores the documents as JSON files, the application token in token_file
+    and the other keys in token_file.<key>
+
+    The files are read and written in the default executor, off the event
+    loop. Writes go to a temporary file renamed over the previous one, so a
+    reader never sees a partial file, and are serialized between processes
+    by an advisory lock on token_file.lock (on platforms providing fcntl).
+
+    token_file : `str` or `PathLike`
+        Path of the application token file
+    """
+
+    def __init__(self, token_file: Union[str, "os.PathLike[str]"]) -> None:
+        self.token_file = os.fspath(token_file)
+
+    def path(self, key: str) -> str:
+        """
+        Returns the path of the file storing key
+        """
+        if key == APP_TOKEN_KEY:
+            return self.token_file
+        return f"{self.token_file}.{key}"
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        data: Optional[Dict[str, Any]] = await _run_in_executor(self._load, key)
+        return data
+
+    async def save(self, key: str, data: Dict[str, Any]) -> None:
+        await _run_in_executor(self._save, key, data)
+
+    async def delete(self, key: str) -> None:
+        await _run_in_executor(self._delete, key)
+
+    @contextmanager
+    def _lock(self, exclusive: bool) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(f"{self.token_file}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock(exclusive=False):
+            try:
+                with open(self.path(key), "r") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return None
+            except ValueError:
+                logger.warning("Ignoring the invalid token file %s", self.path(key))
+                return None
+        return data if isinstance(data, dict) else None
+
+    def _save(self, key: str, data: Dict[str, Any]) -> None:
+        target = self.path(key)
+        directory = os.path.dirname(os.path.abspath(target))
+        with self._lock(exclusive=True):
+            # mkstemp creates the file readable by its owner only
+            fd, tmp_path = tempfile.mkstemp(
+                dir=directory, prefix=f".{os.path.basename(target)}."
+            )
+            try:
+                with open(fd, "w") as f:
+                    json.dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def _delete(self, key: str) -> None:
+        with self._lock(exclusive=True):
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Keeps the documents in memory, e.g. for tests or tokens provisioned by
+    the host application
+
+    data : `dict`, optional
+        Initial documents by key
+    """
+
+    def __init__(self, data: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.data: Dict[str, Dict[str, Any]] = copy.deepcopy(data or {})
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self.data.get(key)
+        return copy.deepcopy(data) if data is not None else None
+
+    async def save(self, key: str, data: Dict[str, Any]) -> None:
+        self.data[key] = copy.deepcopy(data)
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+
+class CallbackTokenStore(TokenStore):
+    """
+    Delegates the storage of the JSON encoded documents to blocking callables,
+    run in the default executor. Fits keyring like secret stores, e.g.:
+
+        CallbackTokenStore(
+            partial(keyring.get_password, "freebox"),
+            partial(keyring.set_password, "freebox"),
+            partial(keyring.delete_password, "freebox"),
+        )
+
+    load : `callable`
+        Called with the key, returns the stored string or None
+    save : `callable`
+        Called with the key and the string to store
+    delete : `callable`, optional
+        Called with the key to remove, default to None: an empty document is
+        saved instead
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Optional[str]],
+        save: Callable[[str, str], None],
+        delete: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self._load = load
+        self._save = save
+        self._delete = delete
+
+    async def load(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await _run_in_executor(self._load, key)
+        if not value:
+            return None
+        try:
+            data = json.loads(value)
+        except ValueError:
+            logger.warning("Ignoring the invalid stored %s", key)
+            return None
+        return data if isinstance(data, dict) and data else None
+
+    async def save(self, key: str, data: Dict[str, Any]) -> None:
+        await _run_in_executor(self._save, key, json.dumps(data))
+
+    async def delete(self, key: str) -> None:
+        if self._delete is None:
+            await _run_in_executor(self._save, key, "{}")
+        else:
+            await _run_in_executor(self._delete, key)
+
+
+async def _run_in_executor(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
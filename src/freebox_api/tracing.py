@@ -0,0 +1,82 @@
+"""
+Optional OpenTelemetry tracing of the API calls.
+
+Spans are only created when the opentelemetry-api package is installed and
+tracing is enabled, otherwise every helper is a no-op.
+"""
+
+import asyncio
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import ContextManager
+from typing import Mapping
+from typing import Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover
+    otel_trace = None  # type: ignore
+
+
+class Tracer:
+    """
+    Creates OpenTelemetry spans, or does nothing if disabled or unavailable
+
+    enabled : `bool`
+        Default to True
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self._tracer: Any = None
+        if enabled and otel_trace is not None:
+            self._tracer = otel_trace.get_tracer("freebox_api")
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns True if spans are created
+        """
+        return self._tracer is not None
+
+    def span(
+        self, name: str, attributes: Optional[Mapping[str, Any]] = None
+    ) -> ContextManager[Any]:
+        """
+        Returns a context manager running its block in a new span.
+        The span is given to the block, None if tracing is disabled.
+        """
+        if self._tracer is None:
+            return nullcontext()
+        return self._tracer.start_as_current_span(  # type: ignore
+            name, attributes=attributes
+        )
+
+
+def trace_module(module: Any, name: str, tracer: Tracer) -> None:
+    """
+    Run each public coroutine method of a Freebox API module instance in a
+    freebox.<module>.<method> span. The methods are wrapped once, on the
+    instance, which keeps its type.
+    """
+    for attr in dir(type(module)):
+        if attr.startswith("_"):
+            continue
+        method = getattr(module, attr)
+        if asyncio.iscoroutinefunction(method):
+            setattr(module, attr, _traced(method, name, attr, tracer))
+
+
+def _traced(
+    method: Callable[..., Awaitable[Any]], name: str, attr: str, tracer: Tracer
+) -> Callable[..., Awaitable[Any]]:
+    attributes = {"freebox.module": name, "freebox.method": attr}
+
+    @wraps(method)
+    async def traced(*args: Any, **kwargs: Any) -> Any:
+        with tracer.span(f"freebox.{name}.{attr}", attributes):
+            return await method(*args, **kwargs)
+
+    return traced
@@ -0,0 +1,505 @@
+"""
+Streaming file transfers from the Freebox, with bounded memory and resume.
+"""
+
+import asyncio
+from email.utils import parsedate_to_datetime
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import IO
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TypedDict
+from typing import Union
+
+from aiohttp import ClientConnectionError
+from aiohttp import ClientPayloadError
+from aiohttp import ClientResponse
+
+from freebox_api.access import Access
+from freebox_api.exceptions import HttpRequestError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# Smallest segment worth its own request in segmented downloads
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
+# Failures after which a transfer is resumed from the last written byte
+RESUMABLE_ERRORS = (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError)
+
+_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+StrOrPath = Union[str, "os.PathLike[str]"]
+
+
+class TransferProgress(TypedDict):
+    """
+    Progress of a file transfer.
+
+    bytes_done : `int` – Bytes of the file transferred, resumed part included
+    bytes_total : `int` – Size of the file, None if unknown
+    bytes_transferred : `int` – Bytes transferred by this call
+    elapsed : `float` – Seconds since the transfer started
+    rate : `float` – Average bytes per second of this call
+    resumes : `int` – Transfers resumed after a network failure
+    """
+
+    bytes_done: int
+    bytes_total: Optional[int]
+    bytes_transferred: int
+    elapsed: float
+    rate: float
+    resumes: int
+
+
+ProgressCallback = Callable[[TransferProgress], None]
+
+
+def parse_content_range(
+    value: Optional[str],
+) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Returns (first byte, last byte, total size) of a Content-Range header,
+    None for the unknown ones
+    """
+    match = _CONTENT_RANGE.fullmatch(value.strip()) if value else None
+    if match is None:
+        return (None, None, None)
+    first, last, total = match.groups()
+    return (
+        int(first) if first is not None else None,
+        int(last) if last is not None else None,
+        int(total) if total != "*" else None,
+    )
+
+
+def range_headers(start: int, end: Optional[int] = None) -> Dict[str, str]:
+    """
+    Returns the headers requesting bytes start to end (included) of a file,
+    none for the whole file
+    """
+    if not start and end is None:
+        return {}
+    return {"Range": f"bytes={start}-{'' if end is None else end}"}
+
+
+def check_status(resp: ClientResponse, end_url: str) -> None:
+    """
+    Raise HttpRequestError if the file request failed
+    """
+    if resp.status >= 400:
+        raise HttpRequestError(f"Getting {end_url} failed (HTTP {resp.status})")
+
+
+async def iter_stream(
+    access: Access,
+    end_url: str,
+    offset: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Yields the chunks of a file from offset, holding one chunk at a time
+
+    offset : `int`
+        Default to 0, first byte to get, requested with a Range header
+    chunk_size : `int`
+        Default to 256 KiB, maximum size of the chunks
+    """
+    async with access.stream(end_url, range_headers(offset)) as resp:
+        check_status(resp, end_url)
+        # The box sent the whole file: drop the bytes before offset
+        skip = offset if resp.status == 200 else 0
+        async for chunk in resp.content.iter_chunked(chunk_size):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk[skip:], 0
+            yield chunk
+
+
+class _Progress:
+    """
+    Byte counters of a transfer, reported to the progress callback
+    """
+
+    def __init__(
+        self,
+        callback: Optional[ProgressCallback],
+        interval: float,
+        total: Optional[int] = None,
+    ) -> None:
+        self.callback = callback
+        self.interval = interval
+        self.start = time.monotonic()
+        self.reported = self.start
+        self.done = 0
+        self.total = total
+        self.transferred = 0
+        self.resumes = 0
+
+    def add(self, size: int) -> None:
+        self.done += size
+        self.transferred += size
+        now = time.monotonic()
+        if self.callback is not None and now - self.reported >= self.interval:
+            self.reported = now
+            self.callback(self.status())
+
+    def status(self) -> TransferProgress:
+        elapsed = time.monotonic() - self.start
+        return {
+            "bytes_done": self.done,
+            "bytes_total": self.total,
+            "bytes_transferred": self.transferred,
+            "elapsed": elapsed,
+            "rate": self.transferred / elapsed if elapsed else 0.0,
+            "resumes": self.resumes,
+        }
+
+    def finish(self) -> TransferProgress:
+        status = self.status()
+        if self.callback is not None:
+            self.callback(status)
+        return status
+
+
+class _FileDownload:
+    """
+    Writes a file from the box to disk, resuming after network failures
+
+    resumed_mtime : `float`, optional
+        Modification time of the partial file resumed, the file is fetched
+        again if the box reports a later modification
+    """
+
+    def __init__(
+        self,
+        access: Access,
+        end_url: str,
+        chunk_size: int,
+        progress: _Progress,
+        resumed_mtime: Optional[float] = None,
+    ) -> None:
+        self.access = access
+        self.end_url = end_url
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.resumed_mtime = resumed_mtime
+        # ETag or Last-Modified of the first response, sent in If-Range
+        self.validator: Optional[str] = None
+        self.loop = asyncio.get_running_loop()
+
+    async def run(self, file: IO[bytes], max_resumes: int) -> TransferProgress:
+        while True:
+            try:
+                await self.transfer(file)
+                break
+            except RESUMABLE_ERRORS as err:
+                if self.progress.resumes >= max_resumes:
+                    raise
+                self.progress.resumes += 1
+                logger.debug(
+                    "Resuming %s at byte %d after %r",
+                    self.end_url,
+                    self.progress.done,
+                    err,
+                )
+        return self.progress.finish()
+
+    async def transfer(self, file: IO[bytes]) -> None:
+        while not await self.fetch(file):
+            logger.debug("Local part of %s is stale, starting over", self.end_url)
+            await self.loop.run_in_executor(None, _truncate, file)
+            self.progress.done = 0
+
+    async def fetch(self, file: IO[bytes]) -> bool:
+        """
+        Write the file from the current position, returns False if the local
+        part doesn't match the remote file
+        """
+        progress = self.progress
+        headers = range_headers(progress.done)
+        if headers and self.validator is not None:
+            # The box sends the whole file if it changed since the last response
+            headers["If-Range"] = self.validator
+        async with self.access.stream(self.end_url, headers) as resp:
+            if resp.status == 416 and progress.done:
+                # Nothing left to get if the file is already complete, the
+                # local file is stale if it is larger
+                progress.total = parse_content_range(resp.headers.get("Content-Range"))[
+                    2
+                ]
+                return progress.done == progress.total
+            check_status(resp, self.end_url)
+            if self.validator is None:
+                self.validator = _validator(resp)
+            if resp.status == 206:
+                if self._modified_since_resume(resp):
+                    return False
+                first, _, progress.total = parse_content_range(
+                    resp.headers.get("Content-Range")
+                )
+                if first != progress.done:
+                    raise HttpRequestError(f"Unexpected range from {self.end_url}")
+            else:
+                # Range not supported or file changed: the whole file is sent
+                await self.loop.run_in_executor(None, _truncate, file)
+                progress.done = 0
+                progress.total = resp.content_length
+            async for chunk in resp.content.iter_chunked(self.chunk_size):
+                await self.loop.run_in_executor(None, file.write, chunk)
+                progress.add(len(chunk))
+        return True
+
+    def _modified_since_resume(self, resp: ClientResponse) -> bool:
+        resumed_mtime, self.resumed_mtime = self.resumed_mtime, None
+        if resumed_mtime is None:
+            return False
+        try:
+            modified = parsedate_to_datetime(resp.headers["Last-Modified"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return modified.timestamp() > resumed_mtime
+
+
+def _validator(resp: ClientResponse) -> Optional[str]:
+    """
+    Returns the strong ETag of a response, or its Last-Modified date
+    """
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+async def download_to_file(
+    access: Access,
+    end_url: str,
+    destination: StrOrPath,
+    resume: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    progress_interval: float = 0.5,
+    max_resumes: int = 3,
+) -> TransferProgress:
+    """
+    Save a file from the box to destination, one chunk in memory at a time.
+    Returns the final progress with the average throughput.
+
+    Network failures are resumed with a Range request sending the ETag or
+    Last-Modified date of the first response in If-Range, so a file changed
+    meanwhile is fetched again from the start.
+
+    resume : `bool`
+        Default to False, continue an existing destination file with a Range
+        request instead of starting over. The file is fetched again if it is
+        larger than the remote one or older than its last modification.
+    progress : `callable`, optional
+        Called with the TransferProgress at most every progress_interval
+        seconds and once done
+    max_resumes : `int`
+        Default to 3, times the transfer is resumed after a network failure
+    """
+    loop = asyncio.get_running_loop()
+    status = _Progress(progress, progress_interval)
+    file: IO[bytes] = await loop.run_in_executor(
+        None, open, destination, "ab" if resume else "wb"
+    )
+    try:
+        status.done = await loop.run_in_executor(None, file.tell)
+        resumed_mtime = None
+        if status.done:
+            resumed_mtime = await loop.run_in_executor(
+                None, os.path.getmtime, file.name
+            )
+        download = _FileDownload(access, end_url, chunk_size, status, resumed_mtime)
+        return await download.run(file, max_resumes)
+    finally:
+        await loop.run_in_executor(None, file.close)
+
+
+def _truncate(file: IO[Any]) -> None:
+    file.seek(0)
+    file.truncate()
+
+
+async def download_segmented(
+    access: Access,
+    end_url: str,
+    destination: StrOrPath,
+    size: int,
+    segments: int = 4,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    progress_interval: float = 0.5,
+    max_retries: int = 3,
+) -> TransferProgress:
+    """
+    Save a file of known size from the box to destination, fetching segments
+    of it concurrently with Range requests. The destination is preallocated
+    and each segment written in place, one chunk in memory per segment.
+
+    size : `int`
+        Size of the file in bytes
+    segments : `int`
+        Default to 4, concurrent Range requests. Files smaller than
+        MIN_SEGMENT_SIZE by segment use less of them.
+    max_retries : `int`
+        Default to 3, times each segment is resumed after a network failure
+    """
+    loop = asyncio.get_running_loop()
+    status = _Progress(progress, progress_interval, size)
+    fd = await loop.run_in_executor(None, _open_preallocated, destination, size)
+    try:
+        tasks = [
+            asyncio.ensure_future(
+                _Segment(access, end_url, fd, start, end, chunk_size, status).run(
+                    max_retries
+                )
+            )
+            for start, end in split_segments(size, segments)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    finally:
+        await loop.run_in_executor(None, os.close, fd)
+    return status.finish()
+
+
+def split_segments(size: int, segments: int) -> List[Tuple[int, int]]:
+    """
+    Returns the (first byte, last byte) of the segments of a file, at most
+    segments of them and none smaller than MIN_SEGMENT_SIZE except the last
+    """
+    if size <= 0:
+        return []
+    count = max(1, min(segments, -(-size // MIN_SEGMENT_SIZE)))
+    length = -(-size // count)
+    return [(start, min(start + length, size) - 1) for start in range(0, size, length)]
+
+
+class _Segment:
+    """
+    Byte range of a segmented download, written at its place in the file
+    """
+
+    def __init__(
+        self,
+        access: Access,
+        end_url: str,
+        fd: int,
+        start: int,
+        end: int,
+        chunk_size: int,
+        progress: _Progress,
+    ) -> None:
+        self.access = access
+        self.end_url = end_url
+        self.fd = fd
+        self.position = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    async def run(self, max_retries: int) -> None:
+        retries = 0
+        while self.position <= self.end:
+            try:
+                await self.fetch()
+                if self.position <= self.end:
+                    raise ClientPayloadError(f"Segment ended at byte {self.position}")
+            except RESUMABLE_ERRORS as err:
+                if retries >= max_retries:
+                    raise
+                retries += 1
+                self.progress.resumes += 1
+                logger.debug(
+                    "Resuming %s at byte %d after %r", self.end_url, self.position, err
+                )
+
+    async def fetch(self) -> None:
+        loop = asyncio.get_running_loop()
+        headers = range_headers(self.position, self.end)
+        async with self.access.stream(self.end_url, headers) as resp:
+            check_status(resp, self.end_url)
+            first = parse_content_range(resp.headers.get("Content-Range"))[0]
+            if resp.status != 206 or first != self.position:
+                raise HttpRequestError(
+                    f"Range requests not supported by {self.end_url}"
+                )
+            async for chunk in resp.content.iter_chunked(self.chunk_size):
+                chunk = chunk[: self.end + 1 - self.position]
+                await loop.run_in_executor(None, _pwrite, self.fd, chunk, self.position)
+                self.position += len(chunk)
+                self.progress.add(len(chunk))
+                if self.position > self.end:
+                    # Don't read past the segment if the box sent more
+                    break
+
+
+async def file_digest(
+    path: StrOrPath, hash_type: str = "sha1", block_size: int = 1024 * 1024
+) -> str:
+    """
+    Returns the hexadecimal digest of a local file, read off the event loop
+    """
+
+    def digest() -> str:
+        file_hash = hashlib.new(hash_type)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    result: str = await asyncio.get_running_loop().run_in_executor(None, digest)
+    return result
+
+
+def _open_preallocated(path: StrOrPath, size: int) -> int:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_BINARY, 0o666)
+    try:
+        if size:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                # Not supported by the platform or the file system
+                os.ftruncate(fd, size)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+_write_lock = threading.Lock()
+
+
+def _pwrite(fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:  # pragma: no cover
+            with _write_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+        view = view[written:]
+        offset += written
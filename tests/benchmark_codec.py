@@ -0,0 +1,121 @@
+"""
+Compare the JSON codecs on Freebox API responses.
+
+Run with recorded responses (raw JSON bodies saved from the box):
+    python tests/benchmark_codec.py epg.json lan_browser.json downloads.json
+
+Without arguments, synthetic responses shaped like tv/epg/by_time,
+lan/browser/pub, downloads/ and rrd/ are used.
+"""
+
+import sys
+import timeit
+from typing import Any
+from typing import Dict
+from typing import List
+
+from freebox_api.codec import CODECS
+from freebox_api.codec import JsonCodec
+
+
+def synthetic_responses() -> Dict[str, bytes]:
+    """Build API responses with realistic sizes and shapes."""
+    epg = {
+        f"uuid-webtv-{c}": {
+            f"pluri_{c}_{p}": {
+                "id": f"pluri_{c}_{p}",
+                "date": 1700000000 + p * 1800,
+                "duration": 1800,
+                "title": f"Programme {p}",
+                "sub_title": "Episode",
+                "category_name": "Série",
+                "picture": f"/api/v8/tv/img/channels/{c}/{p}.png",
+            }
+            for p in range(40)
+        }
+        for c in range(60)
+    }
+    hosts = [
+        {
+            "id": f"ether-00:24:d4:{i:02x}:00:01",
+            "primary_name": f"host-{i}",
+            "host_type": "workstation",
+            "active": bool(i % 2),
+            "reachable": True,
+            "last_activity": 1700000000 + i,
+            "l2ident": {"id": f"00:24:d4:{i:02x}:00:01", "type": "mac_address"},
+            "l3connectivities": [
+                {"addr": f"192.168.1.{i}", "af": "ipv4", "active": True},
+                {"addr": f"fe80::{i:x}", "af": "ipv6", "active": False},
+            ],
+            "names": [{"name": f"host-{i}", "source": "dhcp"}],
+        }
+        for i in range(250)
+    ]
+    downloads = [
+        {
+            "id": i,
+            "name": f"download-{i}.iso",
+            "status": "downloading",
+            "size": 4_000_000_000,
+            "rx_bytes": i * 1_000_000,
+            "tx_bytes": i * 1_000,
+            "rx_rate": 1_200_000,
+            "tx_rate": 10_000,
+            "eta": 3600,
+            "io_priority": "normal",
+            "download_dir": "L0Rpc3F1ZSBkdXIvVMOpbMOpY2hhcmdlbWVudHMv",
+        }
+        for i in range(500)
+    ]
+    rrd = {
+        "date_start": 1700000000,
+        "date_end": 1700086400,
+        "data": [
+            {"time": 1700000000 + t, "rate_down": t * 3, "rate_up": t}
+            for t in range(4000)
+        ],
+    }
+    codec = JsonCodec()
+    return {
+        name: codec.dumps({"success": True, "result": result}).encode()
+        for name, result in (
+            ("tv/epg/by_time", epg),
+            ("lan/browser/pub", hosts),
+            ("downloads/", downloads),
+            ("rrd/", rrd),
+        )
+    }
+
+
+def main(files: List[str]) -> None:
+    if files:
+        responses = {}
+        for file in files:
+            with open(file, "rb") as f:
+                responses[file] = f.read()
+    else:
+        responses = synthetic_responses()
+
+    codecs: List[JsonCodec] = []
+    for codec_class in CODECS.values():
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            print(f"{codec_class.name}: not installed")
+
+    for name, data in responses.items():
+        print(f"\n{name} ({len(data) / 1024:.0f} KiB)")
+        document: Any = JsonCodec().loads(data)
+        for codec in codecs:
+            number = 20
+            loads = timeit.timeit(lambda: codec.loads(data), number=number)
+            dumps = timeit.timeit(lambda: codec.dumps(document), number=number)
+            print(
+                f"  {codec.name:8} loads {loads / number * 1000:8.3f} ms"
+                f"   dumps {dumps / number * 1000:8.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,75 @@
+"""
+Compare the diff engine with diffing JSON dumps of successive polls.
+
+    python tests/benchmark_diff.py
+
+Synthetic downloads/ results are used, with 2% of the records changing
+between polls.
+"""
+
+import copy
+import itertools
+import json
+import timeit
+from typing import Any
+from typing import Dict
+from typing import List
+
+from freebox_api.diff import DiffEngine
+
+
+def downloads(count: int) -> List[Dict[str, Any]]:
+    """Build a downloads/ result shaped like the API one."""
+    return [
+        {
+            "id": i,
+            "name": f"file-{i}.iso",
+            "status": "downloading",
+            "size": 4_000_000_000,
+            "rx_bytes": i * 1000,
+            "tx_bytes": 0,
+            "rx_rate": 500_000,
+            "tx_rate": 0,
+            "eta": 3600,
+            "queue_pos": i,
+            "download_dir": "L0Rpc3F1ZSBkdXI=",
+            "error": "none",
+        }
+        for i in range(count)
+    ]
+
+
+def naive_diff(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> int:
+    """Diff by serializing each record, as done before the diff engine."""
+    old_dumps = {r["id"]: json.dumps(r, sort_keys=True) for r in old}
+    return sum(
+        1 for r in new if old_dumps.get(r["id"]) != json.dumps(r, sort_keys=True)
+    )
+
+
+def main() -> None:
+    for count in (100, 1000, 5000):
+        previous = downloads(count)
+        current = copy.deepcopy(previous)
+        for record in current[::50]:
+            record["rx_bytes"] += 1_000_000
+        engine = DiffEngine()
+        engine.update(previous)
+
+        polls = itertools.cycle((current, previous))
+
+        def engine_diff() -> None:
+            # Alternate the polls: each update sees the same 2% of changes
+            engine.update(next(polls))
+
+        runs = 20
+        naive = timeit.timeit(lambda: naive_diff(previous, current), number=runs)
+        fast = timeit.timeit(engine_diff, number=runs)
+        print(
+            f"{count} records: json dumps {naive / runs * 1000:.2f} ms, "
+            f"diff engine {fast / runs * 1000:.2f} ms ({naive / fast:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Import time regression check.
+
+    python tests/benchmark_import.py [budget_ms]
+
+Runs `python -X importtime -c "import freebox_api"` several times and fails if
+the median cumulative import time of the package exceeds the budget.
+"""
+
+import statistics
+import subprocess  # noqa: S404
+import sys
+
+DEFAULT_BUDGET_MS = 10.0
+MODULE = "freebox_api"
+
+
+def import_time_ms(module: str) -> float:
+    """Cumulative import time of module in a fresh interpreter, in ms."""
+    stderr = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def main(budget_ms: float) -> int:
+    timings = [import_time_ms(MODULE) for _ in range(9)]
+    median = statistics.median(timings)
+    print(f"import {MODULE}: {median:.1f} ms (budget {budget_ms:.1f} ms)")
+    return 0 if median <= budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
@@ -0,0 +1,64 @@
+"""
+Measure the package import time and the local cost of Freepybox.open().
+
+    python tests/benchmark_startup.py
+
+open() is measured without network: the Freebox authorization step is
+replaced so only the session, SSL and module set up is timed.
+"""
+
+import asyncio
+import statistics
+import subprocess  # noqa: S404
+import sys
+import time
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(module: str, runs: int = 15) -> float:
+    """Median time in seconds to import module in a fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output))
+    return statistics.median(timings)
+
+
+async def measure_open(runs: int = 50) -> float:
+    """Median time in seconds of Freepybox.open() plus one module lookup."""
+    from freebox_api import Freepybox
+    from freebox_api.access import Access
+
+    async def get_freebox_access(self, host, port, api_version, *args, **kwargs):
+        base_url = self._get_base_url(host, port, api_version)
+        return Access(self._session, base_url, "token", "app", self.timeout)
+
+    Freepybox._get_freebox_access = get_freebox_access  # type: ignore
+    timings = []
+    for _ in range(runs):
+        fbx = Freepybox()
+        start = time.perf_counter()
+        await fbx.open("mafreebox.freebox.fr", "443")
+        fbx.system
+        timings.append(time.perf_counter() - start)
+        await fbx._session.close()
+    return statistics.median(timings)
+
+
+def main() -> None:
+    for module in ("freebox_api", "freebox_api.aiofreepybox"):
+        print(f"import {module}: {measure_import(module) * 1000:.1f} ms")
+    print(f"open(): {asyncio.run(measure_open()) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Fakes and fixtures shared by the test suite."""
+
+import asyncio
+import inspect
+import json
+import re
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from aiohttp import ServerDisconnectedError
+import pytest
+
+from freebox_api.access import Access
+from freebox_api.aiofreepybox import DEFAULT_APP_DESC
+from freebox_api.token_store import APP_TOKEN_KEY
+from freebox_api.token_store import MemoryTokenStore
+
+BASE_URL = "https://freebox.test/api/v8/"
+
+# Application descriptor of a token already granted by the fake Freebox
+GRANTED_APP_TOKEN = {**DEFAULT_APP_DESC, "app_token": "app-token", "track_id": 1}
+
+# Handler of an API path, called with the method and request headers. It
+# returns a response object, or the API document to answer as JSON.
+Route = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> Optional[bool]:
+    """
+    Run the coroutine test functions in a new event loop
+    """
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {
+        name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames
+    }
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
+
+
+class FakeResponse:
+    """Minimal aiohttp response stand-in."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self._data = data
+        self.content_type = "application/json"
+        self.status = 200
+        self.headers: Dict[str, str] = {}
+
+    async def json(self) -> Dict[str, Any]:
+        return self._data
+
+    async def read(self) -> bytes:
+        return json.dumps(self._data).encode()
+
+    def release(self) -> None:
+        pass
+
+
+class FakeFreebox:
+    """Fake Freebox answering login and API calls like the real box."""
+
+    def __init__(self, latency: float = 0.01) -> None:
+        self.latency = latency
+        self.valid_token = "token-0"
+        self.session_posts = 0
+        self.authorizations = 0
+        # Session token sent by each login status request
+        self.login_checks: List[Optional[str]] = []
+        # SSL context given with each request
+        self.ssl_contexts: List[Any] = []
+        self.calls: List[str] = []
+        # Number of upcoming API calls failing with a connection reset
+        self.disconnects = 0
+        # Handlers of API paths, the other ones answer {"path": path}
+        self.routes: Dict[str, Route] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+
+    async def _answer(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, Any]],
+        options: Dict[str, Any],
+    ) -> Any:
+        self.ssl_contexts.append(options.get("ssl"))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            path = re.sub(r"^https://[^/]+/api/v\d+/", "", url)
+            return await self._route(method, path, headers or {})
+        finally:
+            self.in_flight -= 1
+
+    async def _route(self, method: str, path: str, headers: Dict[str, Any]) -> Any:
+        if path == "login":
+            self.login_checks.append(headers.get("X-Fbx-App-Auth"))
+            return FakeResponse({"success": True, "result": {"challenge": "c"}})
+        if path == "login/authorize/":
+            self.authorizations += 1
+            result = {"app_token": f"app-token-{self.authorizations}", "track_id": 1}
+            return FakeResponse({"success": True, "result": result})
+        if path == "login/authorize/1":
+            return FakeResponse({"success": True, "result": {"status": "granted"}})
+        if path == "login/session/":
+            self.session_posts += 1
+            self.valid_token = f"token-{self.session_posts}"
+            return FakeResponse(
+                {
+                    "success": True,
+                    "result": {
+                        "session_token": self.valid_token,
+                        "permissions": {"settings": True},
+                    },
+                }
+            )
+        self.calls.append(path)
+        if self.disconnects:
+            self.disconnects -= 1
+            raise ServerDisconnectedError()
+        if headers.get("X-Fbx-App-Auth") != self.valid_token:
+            return FakeResponse({"success": False, "error_code": "invalid_session"})
+        route = self.routes.get(path)
+        if route is None:
+            return FakeResponse({"success": True, "result": {"path": path}})
+        response = await route(method, headers)
+        return FakeResponse(response) if isinstance(response, dict) else response
+
+    async def get(self, url: str, headers: Any = None, **kwargs: Any) -> Any:
+        return await self._answer("GET", url, headers, kwargs)
+
+    async def post(self, url: str, headers: Any = None, **kwargs: Any) -> Any:
+        return await self._answer("POST", url, headers, kwargs)
+
+    async def put(self, url: str, headers: Any = None, **kwargs: Any) -> Any:
+        return await self._answer("PUT", url, headers, kwargs)
+
+    async def delete(self, url: str, headers: Any = None, **kwargs: Any) -> Any:
+        return await self._answer("DELETE", url, headers, kwargs)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def make_box() -> Callable[..., FakeFreebox]:
+    """
+    Returns a factory of fake Freeboxes, taking the latency
+    """
+    return FakeFreebox
+
+
+@pytest.fixture
+def box() -> FakeFreebox:
+    """
+    Returns a fake Freebox
+    """
+    return FakeFreebox()
+
+
+@pytest.fixture
+def make_access() -> Callable[..., Access]:
+    """
+    Returns a factory of Access to a fake Freebox, taking the box and Access
+    options
+    """
+
+    def make(box: FakeFreebox, **options: Any) -> Access:
+        return Access(
+            box, BASE_URL, "app-token", "app-id", 10, **options  # type: ignore
+        )
+
+    return make
+
+
+@pytest.fixture
+def access(box: FakeFreebox, make_access: Callable[..., Access]) -> Access:
+    """
+    Returns an Access to the box fixture
+    """
+    return make_access(box)
+
+
+@pytest.fixture
+def token_store() -> MemoryTokenStore:
+    """
+    Returns a token store holding an application token already granted
+    """
+    return MemoryTokenStore({APP_TOKEN_KEY: GRANTED_APP_TOKEN})
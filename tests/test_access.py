@@ -0,0 +1,208 @@
+"""Test the Access request layer against a fake Freebox."""
+
+import asyncio
+from typing import Any
+from typing import List
+
+from aiohttp import ClientSession
+from aiohttp import ServerDisconnectedError
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pytest
+
+from freebox_api.access import Access
+from freebox_api.cache import ResponseCache
+from freebox_api.exceptions import HttpRequestError
+from freebox_api.retry import RetryPolicy
+
+
+async def test_concurrent_requests_share_session_refresh(box: Any, access: Any) -> None:
+    """
+    Requests failing on an expired session trigger a single login
+    """
+    await access.get("system/")
+    assert box.session_posts == 1
+
+    # The box drops the session: every request fails once with the stale token
+    box.valid_token = "expired"
+    results = await asyncio.gather(*(access.get("system/") for _ in range(50)))
+
+    assert all(result == {"path": "system/"} for result in results)
+    assert box.session_posts == 2
+    assert access.session_refreshes == 2
+    assert access.session_refreshes_avoided == 49
+
+
+async def test_response_cache_hits_and_write_invalidation(
+    box: Any, access: Any
+) -> None:
+    """
+    Cached GETs skip the box until a write on the same API
+    """
+    access.cache = ResponseCache({"lan/config/": 60, "system/": 60})
+
+    first = await access.get("lan/config/")
+    first["mutated"] = True
+    assert await access.get("lan/config/") == {"path": "lan/config/"}
+    await access.get("system/")
+    assert box.calls == ["lan/config/", "system/"]
+
+    await access.put("lan/config/", {"name": "box"})
+    await access.get("lan/config/")
+    await access.get("system/")
+    assert box.calls == ["lan/config/", "system/", "lan/config/", "lan/config/"]
+    assert access.cache.stats["hits"] == 2
+    assert access.cache.stats["invalidations"] == 1
+
+
+async def test_concurrent_identical_gets_are_coalesced(box: Any, access: Any) -> None:
+    """
+    Concurrent GETs on the same path share a single request
+    """
+    access.coalesce_requests = True
+    await access.get("system/")
+
+    results = await asyncio.gather(
+        *(access.get("player/") for _ in range(30)), access.get("wifi/ap/")
+    )
+
+    assert results[0] == {"path": "player/"}
+    assert results[-1] == {"path": "wifi/ap/"}
+    assert box.calls == ["system/", "player/", "wifi/ap/"]
+    assert access.coalesced_requests == 29
+    assert not access._inflight_gets
+
+
+async def test_transient_failures_are_retried(box: Any, access: Any) -> None:
+    """
+    GETs are retried on connection resets until the attempts run out
+    """
+    access.retry_policy = RetryPolicy(max_attempts=3, backoff_base=0.01)
+
+    box.disconnects = 2
+    assert await access.get("system/") == {"path": "system/"}
+    assert access.retries == 2
+    assert access.retries_recovered == 1
+
+    box.disconnects = 3
+    with pytest.raises(ServerDisconnectedError):
+        await access.get("system/")
+    assert access.retries_exhausted == 1
+
+    # Non idempotent requests are not retried
+    box.disconnects = 1
+    with pytest.raises(ServerDisconnectedError):
+        await access.post("system/reboot")
+    assert access.retries == 4
+
+
+async def test_gather_returns_results_and_errors(box: Any, access: Any) -> None:
+    """
+    A batch runs its requests concurrently and doesn't fail on one error
+    """
+    await access.get("system/")
+
+    batch = await access.gather(
+        [f"lan/browser/{i}/" for i in range(10)]
+        + [("PUT", "lan/config/", {"name": "box"}), ("PATCH", "lan/config/")]
+    )
+
+    assert len(batch) == 12
+    assert batch[3] == {"path": "lan/browser/3/"}
+    assert batch[10] == {"path": "lan/config/"}
+    assert list(batch.errors) == [11]
+    assert isinstance(batch[11], ValueError)
+    assert not batch.ok
+    # Every request was in flight at once
+    assert box.max_in_flight == 11
+    assert batch.speedup == batch.latency_total / batch.wall_time
+
+
+async def test_keepalive_renews_dropped_session(box: Any, access: Any) -> None:
+    """
+    The keep-alive checks the session it captured and opens a new one
+    """
+    await access.get("system/")
+    assert box.session_posts == 1
+    access.start_keepalive(0.01)
+
+    # The fake box reports the session as logged out on every check
+    while box.session_posts < 2:
+        await asyncio.sleep(0.01)
+    await access.stop_keepalive()
+    assert access._keepalive_task is None
+    assert "token-1" in box.login_checks
+    assert access.session_token == box.valid_token
+    with pytest.raises(ValueError, match="interval"):
+        access.keepalive_interval = None
+        access.start_keepalive()
+
+
+async def test_gets_after_a_write_are_not_coalesced(box: Any, access: Any) -> None:
+    """
+    A GET sent after a write doesn't join a GET sent before it
+    """
+    access.coalesce_requests = True
+    box.latency = 0
+    config = {"name": "old"}
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def lan_config(method: str, headers: Any) -> Any:
+        if method == "PUT":
+            config["name"] = "new"
+            return {"success": True, "result": dict(config)}
+        result = dict(config)
+        if not started.is_set():
+            started.set()
+            await release.wait()
+        return {"success": True, "result": result}
+
+    box.routes["lan/config/"] = lan_config
+    before = asyncio.ensure_future(access.get("lan/config/"))
+    await started.wait()
+    await access.put("lan/config/", {"name": "new"})
+    after = asyncio.ensure_future(access.get("lan/config/"))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await before == {"name": "old"}
+    assert await after == {"name": "new"}
+    assert access.coalesced_requests == 0
+    assert not access._inflight_gets
+
+
+async def test_error_pages_raise_after_retries() -> None:
+    """
+    A non-JSON error response is an error once the retries run out, not a result
+    """
+    statuses = {"system/": 502, "lan/config/": 404, "fs/ls/": 200}
+    attempts: List[str] = []
+
+    async def answer(request: web.Request) -> web.Response:
+        path = request.match_info["path"]
+        attempts.append(path)
+        return web.Response(
+            status=statuses[path], text="<html>Error</html>", content_type="text/html"
+        )
+
+    app = web.Application()
+    app.router.add_get("/api/v8/{path:.+}", answer)
+    async with TestServer(app) as server, ClientSession() as client:
+        access = Access(client, str(server.make_url("/api/v8/")), "t", "a", 10)
+        access.session_token = "token"
+        access.retry_policy = RetryPolicy(max_attempts=3, backoff_base=0.01)
+
+        with pytest.raises(HttpRequestError, match="HTTP 502"):
+            await access.get("system/")
+        assert attempts == ["system/"] * 3
+        assert access.retries_exhausted == 1
+
+        with pytest.raises(HttpRequestError, match="HTTP 404"):
+            await access.get("lan/config/")
+        assert attempts[3:] == ["lan/config/"]
+
+        # Other non-JSON responses are returned as they are
+        resp = await access.get("fs/ls/")
+        assert resp.status == 200
+        assert await resp.text() == "<html>Error</html>"
@@ -0,0 +1,191 @@
+"""Test opening and closing a Freepybox against a fake Freebox."""
+
+import ssl
+from typing import Any
+
+from aiohttp import ClientSession
+import pytest
+
+from freebox_api.access import Access
+from freebox_api.aiofreepybox import DEFAULT_APP_DESC
+from freebox_api.aiofreepybox import DEFAULT_CERTIFICATES_FILE
+from freebox_api.aiofreepybox import Freepybox
+from freebox_api.aiofreepybox import get_ssl_context
+from freebox_api.api.system import System
+from freebox_api.token_store import APP_TOKEN_KEY
+from freebox_api.token_store import SESSION_KEY
+
+
+async def test_reopen_stops_previous_keepalive(box: Any, token_store: Any) -> None:
+    """
+    The keep-alive of the replaced access doesn't outlive a new open()
+    """
+    fbx = Freepybox(token_store=token_store, keepalive_interval=60)
+    await fbx.open("freebox.test", "443", session=box)
+    first = fbx._access
+    assert first._keepalive_task is not None
+
+    await fbx.open("freebox.test", "443", session=box)
+    assert first._keepalive_task is None
+    assert fbx._access is not first
+    assert fbx._access._keepalive_task is not None
+
+    await fbx.close()
+    assert fbx._access._keepalive_task is None
+    assert box.calls[-1] == "login/logout"
+    assert not box.closed
+
+
+async def test_reopen_closes_previous_session(
+    box: Any, token_store: Any, make_access: Any, monkeypatch: Any
+) -> None:
+    """
+    The session created by open() is closed by a new open(), a shared one
+    is left open
+    """
+
+    async def get_freebox_access(self: Freepybox, *args: Any) -> Access:
+        return make_access(box)  # type: ignore
+
+    monkeypatch.setattr(Freepybox, "_get_freebox_access", get_freebox_access)
+    fbx = Freepybox(token_store=token_store)
+    await fbx.open("freebox.test", "443")
+    first = fbx._session
+    await fbx.open("freebox.test", "443")
+    assert first.closed
+    second = fbx._session
+    assert second is not first and not second.closed
+
+    await fbx.open("freebox.test", "443", session=box)
+    assert second.closed
+    await fbx.open("freebox.test", "443")
+    assert not box.closed
+    await fbx.close()
+    assert fbx._session.closed
+
+
+async def test_connector_options_and_shared_session(
+    box: Any, token_store: Any, make_access: Any, monkeypatch: Any
+) -> None:
+    """
+    A dedicated session uses the connector options and is closed with the
+    Freepybox, a shared one gets the Freebox CA per request and is left open
+    """
+
+    async def get_freebox_access(self: Freepybox, *args: Any) -> Access:
+        return make_access(box)  # type: ignore
+
+    fbx = Freepybox(
+        token_store=token_store,
+        connector_options={"limit": 7, "limit_per_host": 3, "force_close": True},
+    )
+    with monkeypatch.context() as patch:
+        patch.setattr(Freepybox, "_get_freebox_access", get_freebox_access)
+        await fbx.open("freebox.test", "443")
+    session = fbx._session
+    assert isinstance(session, ClientSession)
+    assert session.connector is not None
+    assert session.connector.limit == 7
+    assert session.connector.limit_per_host == 3
+    assert session.connector.force_close
+    await fbx.close()
+    assert session.closed
+
+    fbx = Freepybox(token_store=token_store)
+    await fbx.open("freebox.test", "443", session=box)
+    await fbx.system.get_config()
+    assert isinstance(box.ssl_contexts[-1], ssl.SSLContext)
+    await fbx.close()
+    assert not box.closed
+
+
+async def test_ssl_context_is_shared_across_opens(box: Any, token_store: Any) -> None:
+    """
+    The CA bundle is loaded once per host class, not on every open()
+    """
+    get_ssl_context.cache_clear()
+    for _ in range(3):
+        fbx = Freepybox(token_store=token_store)
+        await fbx.open("mafreebox.freebox.fr", "443", session=box)
+        await fbx.system.get_config()
+        await fbx.close()
+    await Freepybox(token_store=token_store).open("freebox.test", "443", session=box)
+
+    assert get_ssl_context.cache_info().misses == 2
+    freebox_ctx = get_ssl_context(DEFAULT_CERTIFICATES_FILE, True)
+    assert box.ssl_contexts.count(freebox_ctx) >= 3
+    assert freebox_ctx is not get_ssl_context(DEFAULT_CERTIFICATES_FILE, False)
+    assert not freebox_ctx.verify_flags & ssl.VERIFY_X509_STRICT
+    assert freebox_ctx.cert_store_stats()["x509_ca"] > 0
+
+
+async def test_api_modules_are_built_on_first_access(
+    box: Any, token_store: Any
+) -> None:
+    """
+    An API module is built once on first access and rebuilt after a re-open
+    """
+    fbx = Freepybox(token_store=token_store)
+    with pytest.raises(AttributeError, match="system"):
+        fbx.system
+    await fbx.open("freebox.test", "443", session=box)
+    assert "system" not in vars(fbx)
+
+    system = fbx.system
+    assert isinstance(system, System)
+    assert system._access is fbx._access
+    assert fbx.system is system
+    assert "lan" not in vars(fbx)
+    with pytest.raises(AttributeError, match="unknown"):
+        fbx.unknown
+
+    await fbx.open("freebox.test", "443", session=box)
+    assert fbx.system is not system
+    assert fbx.system._access is fbx._access
+    await fbx.close()
+
+
+async def test_persisted_session_is_restored_on_open(
+    box: Any, token_store: Any
+) -> None:
+    """
+    A persisted session skips the login of the next Freepybox, until it is
+    dropped by the box or a new application token is issued
+    """
+    fbx = Freepybox(token_store=token_store, persist_session=True)
+    await fbx.open("freebox.test", "443", session=box)
+    await fbx.system.get_config()
+    await fbx.close()
+    assert box.session_posts == 1
+    assert "login/logout" not in box.calls
+    assert (await token_store.load(SESSION_KEY))["session_token"] == "token-1"
+
+    # Next process: the stored session is used without login
+    fbx = Freepybox(token_store=token_store, persist_session=True)
+    await fbx.open("freebox.test", "443", session=box)
+    assert await fbx.system.get_config() == {"path": "system/"}
+    assert box.session_posts == 1
+
+    # The box dropped it meanwhile: the request is replayed after a login
+    box.valid_token = "expired"
+    assert await fbx.system.get_config() == {"path": "system/"}
+    assert box.session_posts == 2
+    assert (await token_store.load(SESSION_KEY))["session_token"] == "token-2"
+    await fbx.close()
+
+    # Another Freebox doesn't use the stored session
+    fbx = Freepybox(token_store=token_store, persist_session=True)
+    await fbx.open("other.freebox.test", "443", session=box)
+    assert fbx._access.session_token is None
+
+    # A new application token invalidates the stored session
+    fbx = Freepybox(
+        app_desc={**DEFAULT_APP_DESC, "app_version": "2.0"},
+        token_store=token_store,
+        persist_session=True,
+    )
+    await fbx.open("freebox.test", "443", session=box)
+    assert box.authorizations == 1
+    assert fbx._access.session_token is None
+    assert await token_store.load(SESSION_KEY) is None
+    assert (await token_store.load(APP_TOKEN_KEY))["app_token"] == "app-token-1"
@@ -0,0 +1,53 @@
+"""Test the JSON codec selection."""
+
+from importlib.util import find_spec
+import sys
+from typing import Any
+from typing import Union
+
+import pytest
+
+from freebox_api.codec import get_codec
+from freebox_api.codec import JsonCodec
+
+
+def test_fastest_installed_codec_is_selected(monkeypatch: Any) -> None:
+    """
+    The codecs are tried by order of preference, json is the fallback
+    """
+    if find_spec("orjson") is not None:
+        codec = get_codec()
+        assert codec.name == "orjson"
+        assert codec.loads(codec.dumps({1: "a", "b": [True, None]})) == {
+            "1": "a",
+            "b": [True, None],
+        }
+
+    for module in ("orjson", "msgspec", "ujson"):
+        monkeypatch.setitem(sys.modules, module, None)
+    assert type(get_codec()) is JsonCodec
+    with pytest.raises(ImportError):
+        get_codec("ujson")
+    with pytest.raises(ValueError, match="Unknown"):
+        get_codec("simplejson")
+
+
+class CountingCodec(JsonCodec):
+    """Standard codec counting the decoded documents."""
+
+    decoded = 0
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        self.decoded += 1
+        return super().loads(data)
+
+
+async def test_access_decodes_with_its_codec(box: Any, make_access: Any) -> None:
+    """
+    Responses are decoded by the codec given to the access
+    """
+    codec = CountingCodec()
+    access = make_access(box, json_codec=codec)
+    assert await access.get("system/") == {"path": "system/"}
+    # The session login then the request
+    assert codec.decoded >= 2
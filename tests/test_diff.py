@@ -0,0 +1,68 @@
+"""Test the diff engine."""
+
+from typing import Any
+from typing import List
+
+from freebox_api.diff import Change
+from freebox_api.diff import DiffEngine
+
+
+def test_update_reports_only_changes() -> None:
+    """
+    Records are matched by id and changes carry field level deltas
+    """
+    engine = DiffEngine(ignore=["last_activity"])
+    received: List[List[Change]] = []
+    engine.add_listener(received.append)
+
+    hosts: List[Any] = [
+        {"id": "ether-1", "active": True, "l2ident": {"type": "mac_address"}},
+        {"id": "ether-2", "active": True, "last_activity": 1},
+    ]
+    assert [change["kind"] for change in engine.update(hosts)] == ["added"] * 2
+
+    hosts = [
+        {"id": "ether-2", "active": True, "last_activity": 2},
+        {"id": "ether-1", "active": False, "l2ident": {"type": "dhcp"}},
+        {"id": "ether-3", "active": True},
+    ]
+    changes = engine.update(hosts)
+    assert changes == [
+        {
+            "kind": "changed",
+            "key": "ether-1",
+            "record": hosts[1],
+            "fields": {
+                "active": (True, False),
+                "l2ident.type": ("mac_address", "dhcp"),
+            },
+        },
+        {"kind": "added", "key": "ether-3", "record": hosts[2], "fields": {}},
+    ]
+
+    changes = engine.update(None)
+    assert sorted(str(change["key"]) for change in changes) == [
+        "ether-1",
+        "ether-2",
+        "ether-3",
+    ]
+    assert all(change["kind"] == "removed" for change in changes)
+    assert engine.update([]) == []
+    assert len(received) == 3
+
+
+def test_state_is_not_shared_with_the_caller() -> None:
+    """
+    Records modified in place after an update are still compared to the
+    values they had
+    """
+    engine = DiffEngine()
+    download = {"id": 1, "status": "downloading", "rx_bytes": 0}
+    engine.update([download])
+
+    download["status"] = "done"
+    changes = engine.update([download])
+    assert [change["fields"] for change in changes] == [
+        {"status": ("downloading", "done")}
+    ]
+    assert engine.update([download]) == []
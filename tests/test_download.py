@@ -0,0 +1,48 @@
+"""Test the bulk download operations against a fake Freebox."""
+
+from typing import Any
+from typing import Dict
+
+from freebox_api.api.download import Download
+from freebox_api.exceptions import HttpRequestError
+
+TASKS = [
+    {"id": 1, "status": "seeding"},
+    {"id": 2, "status": "downloading"},
+    {"id": 3, "status": "seeding"},
+]
+
+
+async def test_bulk_operations_report_each_task(box: Any, access: Any) -> None:
+    """
+    Tasks are selected by id or predicate, failures are reported per task
+    """
+
+    async def tasks(method: str, headers: Dict[str, Any]) -> Any:
+        return {"success": True, "result": TASKS}
+
+    async def missing(method: str, headers: Dict[str, Any]) -> Any:
+        return {"success": False, "error_code": "task_not_found"}
+
+    box.routes["downloads/"] = tasks
+    box.routes["downloads/3"] = missing
+    download = Download(access)
+
+    result = await download.update_many(range(10, 30), {"status": "stopped"}, 4)
+    assert result.ok
+    assert list(result) == list(range(10, 30))
+    assert box.max_in_flight == 4
+    assert result.throughput > 0
+
+    result = await download.set_priority_many(
+        lambda task: task["status"] == "seeding", "low"
+    )
+    assert list(result) == [1, 3]
+    assert result[1] == {"path": "downloads/1"}
+    assert isinstance(result.errors[3], HttpRequestError)
+
+    box.calls.clear()
+    result = await download.delete_many([1, 2], erase_files=True)
+    assert result.ok
+    assert sorted(box.calls) == ["downloads/1/erase/", "downloads/2/erase/"]
+    assert box.in_flight == 0
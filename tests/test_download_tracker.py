@@ -0,0 +1,137 @@
+"""Test the download tracker."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+import pytest
+
+from freebox_api import download_tracker
+from freebox_api.api.download import Download
+from freebox_api.download_tracker import DownloadEvent
+from freebox_api.download_tracker import DownloadTracker
+
+
+class TaskRoute:
+    """Route of a fake Freebox answering the tasks of each poll in turn"""
+
+    def __init__(self, box: Any, polls: List[Any]) -> None:
+        box.latency = 0
+        box.routes["downloads/"] = self
+        self.polls = polls
+        self.requests = 0
+        # Cleared to hold the polls until it is set
+        self.answer = asyncio.Event()
+        self.answer.set()
+
+    async def __call__(self, method: str, headers: Dict[str, Any]) -> Any:
+        self.requests += 1
+        await self.answer.wait()
+        tasks = self.polls.pop(0)
+        if tasks is None:
+            return {"success": True}
+        return {"success": True, "result": tasks}
+
+
+async def until(condition: Callable[[], bool]) -> None:
+    """
+    Let the background tasks run until condition is true
+    """
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    assert condition()
+
+
+def task(download_id: int, status: str, rx_bytes: int, **fields: Any) -> Any:
+    return {
+        "id": download_id,
+        "status": status,
+        "rx_bytes": rx_bytes,
+        "tx_bytes": 0,
+        **fields,
+    }
+
+
+async def test_poll_reports_events_and_rates(
+    box: Any, access: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Only changed tasks give events, rates use the time between polls and the
+    interval backs off while idle
+    """
+    clock = iter([0.0, 2.0, 4.0, 6.0, 8.0])
+    monkeypatch.setattr(
+        download_tracker, "time", SimpleNamespace(monotonic=lambda: next(clock))
+    )
+    TaskRoute(
+        box,
+        [
+            [task(1, "downloading", 0), task(2, "done", 10)],
+            [task(1, "downloading", 2000, eta=5), task(2, "done", 10, eta=0)],
+            [task(1, "done", 3000)],
+            [task(1, "done", 3000)],
+            None,
+        ],
+    )
+    tracker = DownloadTracker(Download(access), smoothing=0)
+    received: List[List[DownloadEvent]] = []
+    tracker.add_listener(received.append)
+
+    events = await tracker.poll()
+    assert [event["kind"] for event in events] == ["added", "added"]
+    assert events[0]["previous_status"] is None
+
+    events = await tracker.poll()
+    assert len(events) == 1
+    assert events[0]["kind"] == "progress"
+    assert events[0]["task"]["eta"] == 5
+    assert events[0]["rx_delta"] == 2000
+    assert events[0]["rx_rate"] == 1000
+    assert tracker.rates(1) == {"rx_rate": 1000, "tx_rate": 0}
+
+    events = await tracker.poll()
+    assert [event["kind"] for event in events] == ["status", "removed"]
+    assert events[0]["previous_status"] == "downloading"
+    assert events[0]["status"] == "done"
+    assert events[0]["rx_rate"] == 500
+    assert events[1]["id"] == 2
+    assert tracker.rates(2) is None
+    assert tracker.interval == tracker.min_interval
+
+    # A stalled task gives no event but its rates decay
+    assert await tracker.poll() == []
+    assert tracker.interval == tracker.min_interval * tracker.backoff
+    assert tracker.rates(1) == {"rx_rate": 0, "tx_rate": 0}
+
+    events = await tracker.poll()
+    assert [event["kind"] for event in events] == ["removed"]
+    assert len(received) == 4
+
+
+async def test_background_polling(box: Any, access: Any) -> None:
+    """
+    wakeup() triggers a poll without waiting for the interval, even when
+    called during a poll
+    """
+    route = TaskRoute(
+        box,
+        [[task(1, "queued", 0)], [task(1, "downloading", 0)], [task(1, "done", 0)]],
+    )
+    tracker = DownloadTracker(Download(access), min_interval=60)
+
+    route.answer.clear()
+    tracker.start()
+    await until(lambda: route.requests == 1)
+    tracker.wakeup()
+    route.answer.set()
+    await until(lambda: tracker.polls == 2)
+
+    tracker.wakeup()
+    await until(lambda: tracker.polls == 3)
+    await tracker.stop()
+    assert route.polls == []
@@ -0,0 +1,34 @@
+"""Test that importing the package stays light."""
+
+import subprocess  # noqa: S404
+import sys
+
+CHECK_MODULES = (
+    "import sys, freebox_api, freebox_api.exceptions, freebox_api.constants; "
+    "print(','.join(m for m in ('aiohttp', 'importlib.metadata', "
+    "'freebox_api.aiofreepybox') if m in sys.modules))"
+)
+
+
+def test_import_defers_heavy_modules() -> None:
+    """
+    aiohttp, the metadata lookup and the client are imported on first use only
+    """
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", CHECK_MODULES],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert output.strip() == ""
+
+
+def test_lazy_attributes() -> None:
+    """
+    Freepybox and __version__ are still available from the package
+    """
+    import freebox_api
+    from freebox_api.aiofreepybox import Freepybox
+
+    assert freebox_api.Freepybox is Freepybox
+    assert isinstance(freebox_api.__version__, str)
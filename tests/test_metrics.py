@@ -0,0 +1,112 @@
+"""Test the request metrics collector."""
+
+from typing import Any
+
+from freebox_api.metrics import MetricsCollector
+from freebox_api.metrics import RequestEvent
+from freebox_api.metrics import template_path
+
+
+def event(path: str, duration: float, **fields: Any) -> RequestEvent:
+    """
+    Returns a successful GET event
+    """
+    result: RequestEvent = {
+        "method": "GET",
+        "path": path,
+        "status": 200,
+        "bytes_in": 100,
+        "bytes_out": 0,
+        "duration": duration,
+        "queue_time": 0.0,
+        "retries": 0,
+        "refreshes": 0,
+        "error": None,
+    }
+    result.update(fields)  # type: ignore
+    return result
+
+
+def test_template_path() -> None:
+    """
+    Identifiers are replaced so a resource family is a single series
+    """
+    assert template_path("downloads/12/files/") == "downloads/{id}/files/"
+    assert template_path("downloads/13/files/") == "downloads/{id}/files/"
+    assert template_path("lan/browser/pub/ether-aa:bb:cc:dd:ee:ff") == (
+        "lan/browser/pub/{id}"
+    )
+    assert template_path("vm/3f2504e0-4f89-11d3-9a0c-0305e82c3301/") == "vm/{id}/"
+    assert template_path("fs/ls/L0Rpc3F1ZSBkdXI=?onlyFolder=1") == "fs/ls/{path}"
+    assert template_path("lan/config/?pretty=1") == "lan/config/"
+    assert template_path("fs/ls/") == "fs/ls/"
+
+
+async def test_collector_aggregates_access_requests(box: Any, access: Any) -> None:
+    """
+    The collector registered on Access counts the requests by templated path
+    """
+    collector = MetricsCollector()
+    access.add_listener(collector)
+    for i in range(3):
+        await access.get(f"downloads/{i}/")
+    await access.get("system/")
+
+    endpoints = {endpoint["path"]: endpoint for endpoint in collector.top()}
+    assert set(endpoints) == {"downloads/{id}/", "system/"}
+    assert endpoints["downloads/{id}/"]["count"] == 3
+    assert endpoints["downloads/{id}/"]["errors"] == 0
+    assert endpoints["downloads/{id}/"]["bytes_in"] > 0  # type: ignore
+    assert endpoints["system/"]["count"] == 1
+
+    collector.reset()
+    assert collector.top() == []
+
+
+def test_top_orders_by_total_duration() -> None:
+    """
+    The endpoints spending the most time come first
+    """
+    collector = MetricsCollector()
+    for _ in range(4):
+        collector(event("system/", 0.1))
+    collector(event("fs/ls/{path}", 1.0, error="HttpRequestError"))
+    collector(event("lan/config/", 0.2))
+
+    top = collector.top(2)
+    assert [endpoint["path"] for endpoint in top] == ["fs/ls/{path}", "system/"]
+    assert top[0]["errors"] == 1
+    assert top[1]["count"] == 4
+    assert abs(top[1]["mean"] - 0.1) < 1e-9  # type: ignore
+
+
+def test_prometheus_exposition() -> None:
+    """
+    Durations are exposed as a cumulative histogram, the totals as counters
+    """
+    collector = MetricsCollector(buckets=(1, 0.1))
+    collector(event("system/", 0.05, queue_time=0.5))
+    collector(event("system/", 0.5, retries=2))
+    collector(event("system/", 5, error="TimeoutError"))
+    collector(event('a"b', 0.05, method="PUT", bytes_out=10))
+
+    lines = collector.to_prometheus(prefix="fbx").splitlines()
+    system = 'method="GET",path="system/"'
+    assert lines[:2] == [
+        "# HELP fbx_request_duration_seconds Request duration in seconds",
+        "# TYPE fbx_request_duration_seconds histogram",
+    ]
+    assert lines[2:7] == [
+        f'fbx_request_duration_seconds_bucket{{{system},le="0.1"}} 1',
+        f'fbx_request_duration_seconds_bucket{{{system},le="1"}} 2',
+        f'fbx_request_duration_seconds_bucket{{{system},le="+Inf"}} 3',
+        f"fbx_request_duration_seconds_sum{{{system}}} 5.55",
+        f"fbx_request_duration_seconds_count{{{system}}} 3",
+    ]
+    assert 'fbx_request_duration_seconds_count{method="PUT",path="a\\"b"} 1' in lines
+    assert "# TYPE fbx_requests_total counter" in lines
+    assert f"fbx_requests_total{{{system}}} 3" in lines
+    assert f"fbx_request_errors_total{{{system}}} 1" in lines
+    assert f"fbx_request_retries_total{{{system}}} 2" in lines
+    assert f"fbx_queue_seconds_total{{{system}}} 0.5" in lines
+    assert 'fbx_sent_bytes_total{method="PUT",path="a\\"b"} 10' in lines
@@ -0,0 +1,111 @@
+"""Test the Freebox pool against fake Freeboxes."""
+
+from types import SimpleNamespace
+from typing import Any
+from typing import Dict
+
+from aiohttp import ServerDisconnectedError
+import pytest
+
+from freebox_api import pool as pool_module
+from freebox_api.access import Access
+from freebox_api.aiofreepybox import Freepybox
+from freebox_api.cache import ResponseCache
+from freebox_api.pool import FreeboxPool
+
+
+@pytest.fixture
+def clock(monkeypatch: Any) -> SimpleNamespace:
+    """
+    Simulated clock of the pool
+    """
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(
+        pool_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+@pytest.fixture
+def boxes(monkeypatch: Any, make_box: Any, make_access: Any) -> Dict[str, Any]:
+    """
+    Returns the fake Freeboxes by host, opened by the Freepybox of the pool
+    """
+    boxes = {
+        "fast": make_box(latency=0.001),
+        "slow": make_box(latency=0.02),
+        "down": make_box(latency=0.001),
+    }
+
+    async def get_freebox_access(self: Freepybox, host: str, *args: Any) -> Access:
+        return make_access(  # type: ignore
+            boxes[host],
+            rate_limiter=self.rate_limiter,
+            response_cache=self.response_cache,
+        )
+
+    monkeypatch.setattr(Freepybox, "_get_freebox_access", get_freebox_access)
+    return boxes
+
+
+async def test_fan_out_streams_results(boxes: Any, clock: Any) -> None:
+    """
+    Boxes are opened lazily on the shared session and closed when idle
+    """
+    boxes["down"].disconnects = 1
+
+    async with FreeboxPool(idle_timeout=300, box_rate_limit={"rate": 100}) as pool:
+        for name in ("slow", "down", "fast"):
+            pool.add(name, name, token_file=f"unused_{name}")
+        assert pool.stats["open"] == 0
+
+        results = [item async for item in pool.fan_out("system.get_config")]
+        assert [name for name, _ in results] == ["down", "fast", "slow"]
+        assert isinstance(results[0][1], ServerDisconnectedError)
+        assert results[1][1] == {"path": "system/"}
+        assert pool.stats == {"boxes": 3, "open": 3, "opens": 3, "idle_closes": 0}
+        fast, slow = await pool.get("fast"), await pool.get("slow")
+        assert fast._session is slow._session
+        assert fast.rate_limiter is not None
+        assert fast.rate_limiter.parent is pool.limiter
+        assert pool.limiter.stats["*"]["requests"] == 3
+
+        clock.now = 200
+        await pool.call("slow", "system.get_config")
+        clock.now = 301
+        assert await pool.close_idle() == 2
+        assert pool.stats["open"] == 1
+        assert await pool.call("fast", "system.get_config") == {"path": "system/"}
+        assert pool.stats == {"boxes": 3, "open": 2, "opens": 4, "idle_closes": 2}
+
+        with pytest.raises(ValueError, match="already"):
+            pool.add("fast", "fast")
+        reaper = pool._reaper
+        assert reaper is not None and not reaper.done()
+
+    assert reaper.done()
+    assert pool.stats["open"] == 0
+
+
+async def test_boxes_get_their_own_cache(boxes: Any) -> None:
+    """
+    The response cache of the pool is a template, a token store is per box
+    """
+    with pytest.raises(ValueError, match="token store"):
+        FreeboxPool(token_store=object())
+
+    cache = ResponseCache({"system/": 60})
+    async with FreeboxPool(response_cache=cache, idle_timeout=None) as pool:
+        pool.add("fast", "fast", token_file="unused_fast")
+        pool.add("slow", "slow", token_file="unused_slow")
+        for name in ("fast", "slow", "fast"):
+            assert await pool.call(name, "system.get_config") == {"path": "system/"}
+
+        fast, slow = await pool.get("fast"), await pool.get("slow")
+        assert fast.response_cache is not slow.response_cache
+        assert fast.response_cache is not cache
+        assert fast.response_cache is not None
+        assert fast.response_cache.ttl("system/") == 60
+        assert fast.response_cache.stats["hits"] == 1
+        assert boxes["slow"].calls == ["system/"]
+        assert cache.stats["misses"] == 0
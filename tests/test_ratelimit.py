@@ -0,0 +1,139 @@
+"""Test the rate limiter on a simulated clock."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from typing import List
+
+import pytest
+
+from freebox_api import ratelimit
+from freebox_api.ratelimit import RateLimiter
+from freebox_api.ratelimit import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch: Any) -> SimpleNamespace:
+    """
+    Simulated clock of the rate limiter, advanced by its sleeps
+    """
+    clock = SimpleNamespace(now=0.0, sleeps=[])
+
+    async def sleep(delay: float) -> None:
+        clock.sleeps.append(delay)
+        clock.now += delay
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(
+        ratelimit,
+        "asyncio",
+        SimpleNamespace(Lock=asyncio.Lock, Semaphore=asyncio.Semaphore, sleep=sleep),
+    )
+    return clock
+
+
+async def test_token_bucket_rate_and_burst(clock: Any) -> None:
+    """
+    A burst goes through at once, the next requests are spaced by 1 / rate
+    """
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        await bucket.acquire()
+    assert clock.now == 0
+    for _ in range(4):
+        await bucket.acquire()
+    assert clock.now == pytest.approx(2.0)
+    assert clock.sleeps == [pytest.approx(0.5)] * 4
+
+    # Idle time refills the bucket up to the burst only
+    clock.now += 10
+    for _ in range(3):
+        await bucket.acquire()
+    assert clock.now == pytest.approx(12.0)
+    await bucket.acquire()
+    assert clock.now == pytest.approx(12.5)
+
+
+async def test_family_limits_apply_to_their_paths(clock: Any) -> None:
+    """
+    Only the paths of a throttled family wait, the longest prefix applies
+    """
+    limiter = RateLimiter(
+        families={"rrd/": {"rate": 2}, "rrd/fast/": {"rate": 100, "burst": 10}}
+    )
+    assert limiter.family("rrd/net/") == "rrd/"
+    assert limiter.family("rrd/fast/") == "rrd/fast/"
+    assert limiter.family("connection/") is None
+
+    for _ in range(3):
+        async with limiter.acquire("rrd/net/") as waited:
+            pass
+    assert waited == pytest.approx(0.5)
+    for _ in range(10):
+        async with limiter.acquire("rrd/fast/"):
+            pass
+    async with limiter.acquire("connection/") as waited:
+        assert waited == 0
+    # The burst defaults to the rate
+    assert clock.now == pytest.approx(0.5)
+
+    stats = limiter.stats
+    assert stats["rrd/"]["requests"] == 3
+    assert stats["rrd/"]["queued"] == 1
+    assert stats["rrd/"]["wait_time_max"] == pytest.approx(0.5)
+    assert stats["rrd/fast/"]["queued"] == 0
+    assert stats["*"]["requests"] == 14
+    assert stats["*"]["in_flight"] == 0
+
+
+async def hold(
+    limiter: RateLimiter, path: str, release: asyncio.Event, inside: List[str]
+) -> None:
+    async with limiter.acquire(path):
+        inside.append(path)
+        await release.wait()
+
+
+async def test_in_flight_cap_and_parent(clock: Any) -> None:
+    """
+    Requests beyond max_in_flight wait for a slot, children share the parent's
+    """
+    parent = RateLimiter(max_in_flight=3)
+    first = RateLimiter(max_in_flight=2, parent=parent)
+    second = RateLimiter(parent=parent)
+    release = asyncio.Event()
+    inside: List[str] = []
+
+    tasks: List["asyncio.Task[None]"] = [
+        asyncio.ensure_future(hold(first, "system/", release, inside)) for _ in range(3)
+    ]
+    tasks += [
+        asyncio.ensure_future(hold(second, "lan/", release, inside)) for _ in range(2)
+    ]
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert sorted(inside) == ["lan/", "system/", "system/"]
+    assert parent.stats["*"]["in_flight"] == 3
+    assert parent.stats["*"]["requests"] == 3
+
+    # A request cancelled while waiting for the parent gives its slot back
+    assert second.stats["*"]["in_flight"] == 2
+    tasks[-1].cancel()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert second.stats["*"]["in_flight"] == 1
+
+    release.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert parent.stats["*"]["requests"] == 4
+    assert len(inside) == 4
+    assert first.stats["*"]["requests"] == 3
+    assert all(
+        stats["in_flight"] == 0
+        for limiter in (parent, first, second)
+        for stats in limiter.stats.values()
+    )
+    assert clock.now == 0
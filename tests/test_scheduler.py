@@ -0,0 +1,154 @@
+"""Test the priority scheduler on a simulated clock."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from typing import List
+
+import pytest
+
+from freebox_api import scheduler
+from freebox_api.ratelimit import RateLimiter
+from freebox_api.scheduler import Priority
+from freebox_api.scheduler import PriorityScheduler
+from freebox_api.scheduler import request_priority
+
+
+@pytest.fixture
+def clock(monkeypatch: Any) -> SimpleNamespace:
+    """
+    Simulated clock of the scheduler
+    """
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+async def hold(
+    slots: PriorityScheduler,
+    path: str,
+    release: asyncio.Event,
+    granted: List[str],
+    method: str = "GET",
+) -> None:
+    async with slots.acquire(path, method):
+        granted.append(path)
+        await release.wait()
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_classify_by_rules_and_context() -> None:
+    """
+    Rules match by prefix and method, request_priority() overrides them
+    """
+    slots = PriorityScheduler()
+    assert slots.classify("player/1/api/v6/status/", "get") == Priority.INTERACTIVE
+    assert slots.classify("home/tileset/1", "PUT") == Priority.INTERACTIVE
+    assert slots.classify("home/tileset/1", "GET") == Priority.NORMAL
+    assert slots.classify("rrd/", "POST") == Priority.BULK
+    with request_priority(Priority.BULK):
+        assert slots.classify("player/", "GET") == Priority.BULK
+    assert slots.classify("player/", "GET") == Priority.INTERACTIVE
+    with pytest.raises(ValueError):
+        PriorityScheduler(slots=2, reserved={Priority.INTERACTIVE: 2})
+
+
+async def test_reserved_slots_and_order(clock: Any) -> None:
+    """
+    Bulk requests leave the reserved slots free, waiters are served by class
+    then age
+    """
+    slots = PriorityScheduler(
+        slots=4, reserved={Priority.INTERACTIVE: 1, Priority.NORMAL: 1}
+    )
+    releases = [asyncio.Event() for _ in range(3)]
+    granted: List[str] = []
+    bulk = [
+        asyncio.ensure_future(hold(slots, f"rrd/{i}", releases[0], granted))
+        for i in range(3)
+    ]
+    await settle()
+    assert granted == ["rrd/0", "rrd/1"]
+
+    normal = asyncio.ensure_future(hold(slots, "lan/", releases[1], granted))
+    await settle()
+    assert granted[-1] == "lan/"
+    interactive = asyncio.ensure_future(hold(slots, "player/", releases[2], granted))
+    await settle()
+    assert granted[-1] == "player/"
+    assert slots.in_use == 4
+    assert slots.stats["bulk"]["waiting"] == 1
+
+    releases[1].set()
+    await settle()
+    # The freed normal slot can't go to the bulk waiter
+    assert "rrd/2" not in granted
+    releases[0].set()
+    releases[2].set()
+    await asyncio.gather(*bulk, normal, interactive)
+    assert slots.in_use == 0
+    assert slots.stats["bulk"]["requests"] == 3
+
+
+async def test_starved_requests_never_take_interactive_slots(clock: Any) -> None:
+    """
+    Starved bulk requests are promoted to normal only, an interactive request
+    still gets the reserved slot at once
+    """
+    slots = PriorityScheduler(
+        slots=3, reserved={Priority.INTERACTIVE: 1}, starvation_timeout=0.05
+    )
+    release = asyncio.Event()
+    granted: List[str] = []
+    bulk = [
+        asyncio.ensure_future(hold(slots, f"rrd/{i}", release, granted))
+        for i in range(30)
+    ]
+    await settle()
+    assert len(granted) == 2
+
+    clock.now += 1
+    interactive_release = asyncio.Event()
+    interactive = asyncio.ensure_future(
+        hold(slots, "player/", interactive_release, granted)
+    )
+    await settle()
+    assert granted[-1] == "player/"
+    assert slots.stats["interactive"]["wait_time_max"] == 0
+    assert slots.in_use == 3
+
+    # The starved waiters are served as normal requests, two at a time
+    release.set()
+    await settle()
+    interactive_release.set()
+    await asyncio.gather(*bulk, interactive)
+    assert slots.promoted == 28
+    assert slots.in_use == 0
+
+
+async def test_throttled_requests_hold_no_slot(box: Any, make_access: Any) -> None:
+    """
+    Requests waiting for their family rate don't hold scheduler slots
+    """
+    box.latency = 0
+    slots = PriorityScheduler(slots=3, reserved={Priority.INTERACTIVE: 1})
+    access = make_access(
+        box,
+        scheduler=slots,
+        rate_limiter=RateLimiter(families={"rrd/": {"rate": 2}}),
+    )
+    await access.get("system/")
+    throttled = [asyncio.ensure_future(access.get("rrd/")) for _ in range(8)]
+    await settle()
+    assert slots.in_use == 0
+
+    assert await access.get("connection/") == {"path": "connection/"}
+    # Only the burst of the throttled family went through
+    assert sum(task.done() for task in throttled) == 2
+    for task in throttled:
+        task.cancel()
+    await asyncio.gather(*throttled, return_exceptions=True)
@@ -0,0 +1,39 @@
+"""Test the snapshot collector against a fake Freebox."""
+
+import asyncio
+from typing import Any
+
+from freebox_api.aiofreepybox import Freepybox
+from freebox_api.snapshot import DEFAULT_SNAPSHOT_GETTERS
+from freebox_api.snapshot import take_snapshot
+
+
+async def test_snapshot_calls_getters_concurrently(box: Any, access: Any) -> None:
+    """
+    Getters run concurrently, the ones lacking permissions are skipped
+    """
+    fbx = Freepybox()
+    fbx._access = access
+
+    snapshot = await take_snapshot(fbx)
+
+    assert snapshot["data"]["connection"]["status"] == {"path": "connection/"}
+    assert snapshot["data"]["wifi"]["wifi_custom_keys"] == {"path": "wifi/custom_key/"}
+    assert set(snapshot["skipped"]) == {
+        "storage.get_config",
+        "storage.get_disks",
+        "storage.get_raids",
+    }
+    assert not snapshot["errors"]
+    called = len(DEFAULT_SNAPSHOT_GETTERS) - 3
+    assert len(snapshot["timings"]) == called
+    assert box.max_in_flight == called
+
+    # A getter still running at the end of the budget is cancelled
+    async def never(method: str, headers: Any) -> Any:
+        await asyncio.Event().wait()
+
+    box.routes["system/"] = never
+    snapshot = await take_snapshot(fbx, [("system.get_config", None)], budget=0.05)
+    assert snapshot["errors"] == {"system.get_config": "budget exceeded"}
+    assert box.in_flight == 0
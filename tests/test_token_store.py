@@ -0,0 +1,66 @@
+"""Test the token storage backends."""
+
+import asyncio
+import json
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+import pytest
+
+from freebox_api.token_store import APP_TOKEN_KEY
+from freebox_api.token_store import CallbackTokenStore
+from freebox_api.token_store import FileTokenStore
+from freebox_api.token_store import SESSION_KEY
+from freebox_api.token_store import TokenStore
+
+
+async def test_file_store_writes_are_atomic(tmp_path: Any) -> None:
+    """
+    Concurrent readers only see complete documents, one file per key
+    """
+    store = FileTokenStore(tmp_path / "app_auth")
+    assert await store.load(APP_TOKEN_KEY) is None
+    documents = [{"app_token": str(i) * 4096, "track_id": i} for i in range(20)]
+    results = await asyncio.gather(
+        *(store.save(APP_TOKEN_KEY, document) for document in documents),
+        *(store.load(APP_TOKEN_KEY) for _ in range(20)),
+    )
+    assert all(result is None or result in documents for result in results)
+    assert await store.load(APP_TOKEN_KEY) in documents
+
+    await store.save(SESSION_KEY, {"session_token": "s"})
+    assert (tmp_path / "app_auth.session").exists()
+    await store.delete(SESSION_KEY)
+    await store.delete(SESSION_KEY)
+    assert await store.load(SESSION_KEY) is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "app_auth",
+        "app_auth.lock",
+    ]
+
+
+async def test_callback_store_encodes_documents() -> None:
+    """
+    Documents are stored as JSON strings through the callables
+    """
+    secrets: Dict[str, str] = {}
+    store = CallbackTokenStore(secrets.get, secrets.__setitem__)
+    await store.save(APP_TOKEN_KEY, {"app_token": "t", "track_id": 1})
+    assert json.loads(secrets[APP_TOKEN_KEY]) == {"app_token": "t", "track_id": 1}
+    assert await store.load(APP_TOKEN_KEY) == {"app_token": "t", "track_id": 1}
+    await store.delete(APP_TOKEN_KEY)
+    assert await store.load(APP_TOKEN_KEY) is None
+
+
+def test_store_must_implement_every_operation() -> None:
+    """
+    A backend missing an operation fails on creation, not on first use
+    """
+
+    class ReadOnlyStore(TokenStore):
+        async def load(self, key: str) -> Optional[Dict[str, Any]]:
+            return None
+
+    with pytest.raises(TypeError, match="delete"):
+        ReadOnlyStore()  # type: ignore
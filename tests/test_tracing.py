@@ -0,0 +1,103 @@
+"""Test the OpenTelemetry tracing of the API calls."""
+
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from freebox_api import tracing
+from freebox_api.aiofreepybox import Freepybox
+from freebox_api.api.system import System
+from freebox_api.tracing import trace_module
+from freebox_api.tracing import Tracer
+
+
+@pytest.fixture
+def exporter(monkeypatch: Any) -> Any:
+    """
+    Returns an exporter collecting the spans of the freebox_api tracer
+    """
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    export = pytest.importorskip("opentelemetry.sdk.trace.export")
+    in_memory = pytest.importorskip(
+        "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+    )
+    exporter = in_memory.InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+    # A private provider, the global one can only be set once per process
+    monkeypatch.setattr(
+        tracing, "otel_trace", SimpleNamespace(get_tracer=provider.get_tracer)
+    )
+    return exporter
+
+
+async def test_api_calls_are_traced(box: Any, token_store: Any, exporter: Any) -> None:
+    """
+    Module methods run in a span parent of the request and HTTP spans
+    """
+    fbx = Freepybox(token_store=token_store, tracing=True)
+    await fbx.open("freebox.test", "443", session=box)
+    assert isinstance(fbx.system, System)
+    assert fbx.system.get_config is fbx.system.get_config
+    assert await fbx.system.get_config() == {"path": "system/"}
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    call = spans["freebox.system.get_config"]
+    assert call.attributes["freebox.module"] == "system"
+    assert call.attributes["freebox.method"] == "get_config"
+    request = spans["freebox.request GET system/"]
+    assert request.parent.span_id == call.context.span_id
+    http = spans["freebox.http"]
+    assert http.parent.span_id == request.context.span_id
+    assert http.attributes["http.url"].endswith("/system/")
+    assert "freebox.login.session" in spans
+    await fbx.close()
+
+
+async def test_trace_module_wraps_public_coroutines(exporter: Any) -> None:
+    """
+    Only the public coroutine methods are wrapped, on the instance
+    """
+
+    class Module:
+        name = "module"
+
+        async def run(self, value: int) -> int:
+            return await self._double(value)
+
+        async def _double(self, value: int) -> int:
+            return value * 2
+
+        def describe(self) -> str:
+            return self.name
+
+    module = Module()
+    trace_module(module, "test", Tracer())
+    assert sorted(vars(module)) == ["run"]
+    assert module.run.__name__ == "run"
+    assert await module.run(21) == 42
+    assert module.describe() == "module"
+    assert [span.name for span in exporter.get_finished_spans()] == ["freebox.test.run"]
+    assert await Module().run(1) == 2
+    assert len(exporter.get_finished_spans()) == 1
+
+
+async def test_disabled_tracing_is_a_no_op(
+    box: Any, token_store: Any, monkeypatch: Any
+) -> None:
+    """
+    Without tracing or without opentelemetry, no span is created
+    """
+    assert not Tracer(enabled=False).enabled
+    monkeypatch.setattr(tracing, "otel_trace", None)
+    tracer = Tracer()
+    assert not tracer.enabled
+    with tracer.span("freebox.test", {"key": "value"}) as span:
+        assert span is None
+
+    fbx = Freepybox(token_store=token_store, tracing=True)
+    await fbx.open("freebox.test", "443", session=box)
+    assert "get_config" not in vars(fbx.system)
+    assert await fbx.system.get_config() == {"path": "system/"}
+    await fbx.close()
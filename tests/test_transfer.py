@@ -0,0 +1,322 @@
+"""Test the streaming file transfers against a local HTTP server."""
+
+import asyncio
+import base64
+from contextlib import asynccontextmanager
+import hashlib
+import os
+import re
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from aiohttp import ClientSession
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pytest
+
+from freebox_api import transfer
+from freebox_api.access import Access
+from freebox_api.api.download import Download
+from freebox_api.api.fs import Fs
+from freebox_api.exceptions import ChecksumError
+from freebox_api.transfer import file_digest
+from freebox_api.transfer import split_segments
+from freebox_api.transfer import TransferProgress
+
+FILE_PATH = "/Disque dur/Enregistrements/show.ts"
+FILE_ROUTE = "dl/" + base64.b64encode(FILE_PATH.encode()).decode()
+
+
+async def login(request: web.Request) -> web.Response:
+    return web.json_response({"success": True, "result": {"challenge": "c"}})
+
+
+async def open_session(request: web.Request) -> web.Response:
+    result = {"session_token": "token", "permissions": {}}
+    return web.json_response({"success": True, "result": result})
+
+
+class FileServer:
+    """Freebox serving one file on dl/ over HTTP, honouring Range and If-Range."""
+
+    def __init__(self, data: bytes, destination: Any = None) -> None:
+        self.data = data
+        # Local file of the client, a transfer is cut once it got the bytes
+        # sent so far
+        self.destination = destination
+        self.ranges: List[Optional[str]] = []
+        self.if_ranges: List[Optional[str]] = []
+        # ETag and Last-Modified headers of the responses
+        self.validators: Dict[str, str] = {}
+        # Bytes after which the next transfer is cut
+        self.fail_after: Optional[int] = None
+        # Range of the transfers to cut instead of the next one, and after
+        # how many bytes
+        self.fail_range: Optional[Tuple[str, int]] = None
+        # Data and validators of the file once the next response is sent
+        self.update: Optional[Tuple[bytes, Dict[str, str]]] = None
+        # Send the file up to its end whatever the end of the range
+        self.ignore_range_end = False
+
+    @asynccontextmanager
+    async def access(self) -> AsyncIterator[Access]:
+        """
+        Run the server, yields an Access to it
+        """
+        app = web.Application()
+        app.router.add_get("/api/v8/login", login)
+        app.router.add_post("/api/v8/login/session/", open_session)
+        app.router.add_get("/api/v8/dl/{path}", self.handle)
+        async with TestServer(app) as server, ClientSession() as client:
+            yield Access(client, str(server.make_url("/api/v8/")), "t", "a", 10)
+
+    async def received(self, size: int) -> None:
+        """
+        Wait for the client to write size bytes to its local file
+        """
+        if self.destination is None:
+            return
+        while not (
+            self.destination.exists() and self.destination.stat().st_size >= size
+        ):
+            await asyncio.sleep(0.001)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        assert request.match_info["path"] == FILE_ROUTE[3:]
+        range_header = request.headers.get("Range")
+        self.ranges.append(range_header)
+        self.if_ranges.append(request.headers.get("If-Range"))
+        if request.headers.get("If-Range") not in (None, *self.validators.values()):
+            # The file changed: it is sent whole
+            range_header = None
+        fail_after, self.fail_after = self.fail_after, None
+        if self.fail_range is not None and range_header == self.fail_range[0]:
+            fail_after, self.fail_range = self.fail_range[1], None
+        data, headers = self.data, dict(self.validators)
+        if self.update is not None:
+            (self.data, self.validators), self.update = self.update, None
+
+        start, end = 0, len(data) - 1
+        if range_header:
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header)
+            assert match
+            start = int(match.group(1))
+            if not self.ignore_range_end:
+                end = int(match.group(2) or end)
+        if start >= len(data):
+            headers["Content-Range"] = f"bytes */{len(data)}"
+            return web.Response(status=416, headers=headers)
+        if range_header:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        body = data[start : end + 1]
+        response = web.StreamResponse(
+            status=206 if range_header else 200, headers=headers
+        )
+        response.content_length = len(body)
+        response.content_type = "application/octet-stream"
+        await response.prepare(request)
+        if fail_after is None:
+            await response.write(body)
+        else:
+            # The connection is lost in the middle of the body
+            await response.write(body[:fail_after])
+            await self.received(fail_after)
+            assert request.transport is not None
+            request.transport.close()
+        return response
+
+
+async def test_save_file_resumes_with_range_requests(tmp_path: Any) -> None:
+    """
+    A cut transfer resumes at the last written byte, so does a new call
+    """
+    data = bytes(range(256)) * 4096
+    destination = tmp_path / "show.ts"
+    route = FileServer(data, destination)
+    async with route.access() as access:
+        download = Download(access)
+        progress: List[TransferProgress] = []
+        route.fail_after = 300_000
+        result = await download.save_file(
+            FILE_PATH, destination, progress=progress.append, chunk_size=65536
+        )
+        assert destination.read_bytes() == data
+        assert route.ranges == [None, "bytes=300000-"]
+        assert result["resumes"] == 1
+        assert result["bytes_done"] == result["bytes_total"] == len(data)
+        assert result["rate"] > 0
+        assert progress[-1] == result
+
+        # A partial file from a previous run is completed
+        destination.write_bytes(data[:1000])
+        result = await download.save_file(FILE_PATH, destination, resume=True)
+        assert destination.read_bytes() == data
+        assert result["bytes_transferred"] == len(data) - 1000
+        result = await download.save_file(FILE_PATH, destination, resume=True)
+        assert result["bytes_transferred"] == 0
+        assert route.ranges[-2:] == ["bytes=1000-", f"bytes={len(data)}-"]
+
+        chunks = [chunk async for chunk in download.iter_file(FILE_PATH, 10)]
+        assert b"".join(chunks) == data[10:]
+
+
+async def test_stale_partial_files_are_fetched_again(tmp_path: Any) -> None:
+    """
+    A partial file larger than the remote one, older than its modification or
+    changed during the transfer is not resumed
+    """
+    data = bytes(range(256)) * 1024
+    destination = tmp_path / "show.ts"
+    route = FileServer(data, destination)
+    async with route.access() as access:
+        download = Download(access)
+
+        # Resume is opt-in
+        destination.write_bytes(b"x" * 1000)
+        result = await download.save_file(FILE_PATH, destination)
+        assert destination.read_bytes() == data
+        assert route.ranges == [None]
+
+        destination.write_bytes(data + b"trailing bytes")
+        result = await download.save_file(FILE_PATH, destination, resume=True)
+        assert destination.read_bytes() == data
+        assert result["bytes_transferred"] == len(data)
+        assert route.ranges[-2:] == [f"bytes={len(data) + 14}-", None]
+
+        # The remote file was modified after the partial file was written
+        destination.write_bytes(b"x" * 1000)
+        os.utime(destination, (0, 0))
+        route.validators["Last-Modified"] = "Thu, 01 Jan 1970 00:00:10 GMT"
+        await download.save_file(FILE_PATH, destination, resume=True)
+        assert destination.read_bytes() == data
+        assert route.ranges[-2:] == ["bytes=1000-", None]
+
+        # The file changes before a cut transfer is resumed
+        route.validators = {"ETag": '"v1"'}
+        route.fail_after = 65536
+        route.update = (data[::-1], {"ETag": '"v2"'})
+        result = await download.save_file(FILE_PATH, destination, chunk_size=65536)
+        assert destination.read_bytes() == data[::-1]
+        assert route.ranges[-2:] == [None, "bytes=65536-"]
+        assert route.if_ranges[-2:] == [None, '"v1"']
+        assert result["resumes"] == 1
+
+
+async def test_segmented_download_retries_segments(
+    tmp_path: Any, monkeypatch: Any
+) -> None:
+    """
+    Segments are fetched concurrently, retried alone and checked against the box
+    """
+    data = bytes(range(256)) * 80_000
+    destination = tmp_path / "show.ts"
+    segments = split_segments(len(data), 3)
+    assert len(segments) == 3
+    assert segments[0][0] == 0 and segments[-1][1] == len(data) - 1
+    assert split_segments(1000, 4) == [(0, 999)]
+
+    async def get_file_info(self: Fs, path: str) -> Dict[str, Any]:
+        return {"type": "file", "size": len(data)}
+
+    async def get_file_hash(self: Fs, path: str, hash_type: str) -> str:
+        return box_hash
+
+    box_hash = hashlib.sha1(data).hexdigest()  # noqa: S324
+    monkeypatch.setattr(Fs, "get_file_info", get_file_info)
+    monkeypatch.setattr(Fs, "get_file_hash", get_file_hash)
+    writes: List[int] = []
+
+    def pwrite(fd: int, chunk: bytes, offset: int) -> None:
+        writes.append(len(chunk))
+        os.pwrite(fd, chunk, offset)
+
+    monkeypatch.setattr(transfer, "_pwrite", pwrite)
+
+    route = FileServer(data)
+    start, end = segments[1]
+    route.fail_range = (f"bytes={start}-{end}", 65536)
+    async with route.access() as access:
+        download = Download(access)
+        result = await download.save_file_segmented(
+            FILE_PATH, destination, segments=3, chunk_size=65536
+        )
+        assert destination.read_bytes() == data
+        assert result["resumes"] == 1
+        assert result["bytes_done"] == result["bytes_total"] == len(data)
+        assert len(route.ranges) == 4
+        # The cut segment is resumed alone, up to its end
+        resumed = re.fullmatch(r"bytes=(\d+)-(\d+)", route.ranges[-1] or "")
+        assert resumed is not None
+        assert start <= int(resumed.group(1)) and int(resumed.group(2)) == end
+        assert await file_digest(destination) == box_hash
+
+        # Bytes sent past the end of a segment are not read
+        route.ignore_range_end = True
+        writes.clear()
+        result = await download.save_file_segmented(
+            FILE_PATH, destination, segments=3, chunk_size=65536
+        )
+        assert destination.read_bytes() == data
+        assert result["bytes_transferred"] == len(data)
+        assert 0 not in writes
+
+        box_hash = "0" * 40
+        with pytest.raises(ChecksumError):
+            await download.save_file_segmented(FILE_PATH, destination, segments=3)
+
+
+async def test_upload_streams_multipart_files(tmp_path: Any) -> None:
+    """
+    Torrent files are posted as multipart/form-data, replayed after a login
+    """
+    torrents = []
+    for i in range(3):
+        torrents.append(tmp_path / f"file-{i}.torrent")
+        torrents[-1].write_bytes(b"d8:announce" + bytes([i]) * 200_000)
+    received: List[Dict[str, Any]] = []
+
+    async def add(request: web.Request) -> web.Response:
+        if request.headers.get("X-Fbx-App-Auth") != "token":
+            return web.json_response({"success": False, "error_code": "auth_required"})
+        form = await request.post()
+        upload = form["download_file"]
+        assert isinstance(upload, web.FileField)
+        received.append(
+            {
+                "filename": upload.filename,
+                "content_type": upload.content_type,
+                "size": len(upload.file.read()),
+                "download_dir": form.get("download_dir"),
+            }
+        )
+        return web.json_response({"success": True, "result": {"id": len(received)}})
+
+    app = web.Application()
+    app.router.add_get("/api/v8/login", login)
+    app.router.add_post("/api/v8/login/session/", open_session)
+    app.router.add_post("/api/v8/downloads/add/", add)
+    async with TestServer(app) as server, ClientSession() as client:
+        access = Access(client, str(server.make_url("/api/v8/")), "t", "a", 10)
+        download = Download(access)
+        # A stale session: the first upload is sent again after a login
+        access.session_token = "stale"
+
+        result = await download.add_download_task_from_file(torrents[0], "L0Rs")
+        assert result == {"id": 1}
+        assert received[0] == {
+            "filename": "file-0.torrent",
+            "content_type": "application/x-bittorrent",
+            "size": 200_011,
+            "download_dir": "L0Rs",
+        }
+
+        batch = await download.add_download_tasks_from_files(
+            [torrents[1], torrents[2], tmp_path / "missing.torrent"]
+        )
+        assert sorted(batch[i]["id"] for i in (0, 1)) == [2, 3]
+        assert list(batch.errors) == [2]
+        assert isinstance(batch[2], FileNotFoundError)